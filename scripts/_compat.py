@@ -60,17 +60,21 @@ number_types = integer_types + (float,)
 #
 # Use cdecimal when available
 #
-from decimal import (Decimal as _dec,
+from decimal import (Context as _ctx,
+                     Decimal as _dec,
                      InvalidOperation as _invop,
                      ROUND_HALF_EVEN as _RHE)
 try:
-    from cdecimal import (Decimal as _cdec,
+    from cdecimal import (Context as _cctx,
+                          Decimal as _cdec,
                           InvalidOperation as _cinvop,
                           ROUND_HALF_EVEN as _CRHE)
+    Context = _cctx
     Decimal = _cdec
     InvalidOperation = (_invop, _cinvop)
     ROUND_HALF_EVEN = _CRHE
 except ImportError:
+    Context = _ctx
     Decimal = _dec
     InvalidOperation = _invop
     ROUND_HALF_EVEN = _RHE
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    bench_cldr
+    ~~~~~~~~~~~~~~~~
+    Benchmark suite of the CLDR toolchain: plural rule tokenization and
+    parsing, number and date pattern parsing, interval pattern splitting,
+    the global and per-locale import and the JSON and binary serialization
+    of the imported data.
+
+    By default the benchmarks run on the small synthetic CLDR tree checked in
+    under ``fixtures/common``, so that the results only change with the
+    code.  Each benchmark is run ``--repeat`` times, every run long enough
+    to be timed reliably; the summary gives the minimum, median, mean and
+    standard deviation of the time per operation.  The pattern caches are
+    cleared before every run, so the parsers do the full work each time.
+
+    ``--save FILE`` writes the results as JSON; ``--compare FILE`` compares
+    them with such a saved baseline and exits with status 1 if a benchmark
+    got slower by more than ``--threshold``.
+
+    Usage: ``bench_cldr.py [options] [path/to/cldr/common]``
+"""
+from optparse import OptionParser
+import json
+import math
+import os
+import platform
+import sys
+import timeit
+
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+import cldr_dates
+import cldr_numbers
+import import_cldr
+from import_cldr import (_load_locale_support, _process_local_data, binary_repr,
+                         debug_repr, parse_global)
+from lrucache import caches
+from packdata import packb
+from plural import PluralRule, tokenize_rule
+
+#: The checked-in synthetic CLDR tree
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'fixtures', 'common')
+
+#: Minimum duration of a timed run, in seconds
+MIN_RUN_TIME = 0.2
+
+NUMBER_FORMAT_TAGS = ('decimalFormat', 'percentFormat', 'currencyFormat',
+                      'scientificFormat')
+DATE_PATTERN_TAGS = ('pattern', 'dateFormatItem', 'greatestDifference')
+
+
+def collect_inputs(srcdir):
+    """Return the inputs of the benchmarks found in the CLDR tree
+    `srcdir`."""
+    plural_rules = []
+    for filename in ('plurals.xml', 'ordinals.xml'):
+        tree = ElementTree.parse(os.path.join(srcdir, 'supplemental', filename))
+        for rules in tree.iter('pluralRules'):
+            plural_rules.append([(rule.attrib['count'], rule.text or '')
+                                 for rule in rules.findall('pluralRule')
+                                 if rule.attrib['count'] != 'other'])
+
+    number_patterns = set()
+    date_patterns = set()
+    interval_patterns = set()
+    maindir = os.path.join(srcdir, 'main')
+    locales = sorted(filename for filename in os.listdir(maindir)
+                     if filename.endswith('.xml'))
+    for filename in locales:
+        tree = ElementTree.parse(os.path.join(maindir, filename))
+        for tag in NUMBER_FORMAT_TAGS:
+            for elem in tree.iter(tag):
+                number_patterns.update(pattern.text for pattern in elem.findall('pattern')
+                                       if pattern.text)
+        for calendar in tree.iter('calendar'):
+            for elem in calendar.iter():
+                if elem.tag in DATE_PATTERN_TAGS and elem.text:
+                    date_patterns.add(elem.text)
+                    if elem.tag == 'greatestDifference':
+                        interval_patterns.add(elem.text)
+    return {
+        'plural_rules': plural_rules,
+        'number_patterns': sorted(number_patterns),
+        'date_patterns': sorted(date_patterns),
+        'interval_patterns': sorted(interval_patterns),
+        'locales': locales,
+    }
+
+
+def make_benchmarks(srcdir):
+    """Return the ``(name, operations, function)`` triples of the benchmarks
+    on the CLDR tree `srcdir`; a call of the function performs `operations`
+    operations."""
+    inputs = collect_inputs(srcdir)
+    plural_rules = inputs['plural_rules']
+    rule_strings = [rule for rules in plural_rules for _, rule in rules]
+    sup = import_cldr.parse(os.path.join(srcdir, 'supplemental', 'supplementalData.xml'))
+    support = _load_locale_support(srcdir)
+    # keep the 'Processing ...' lines of every import run out of the output
+    import_cldr.log = lambda message, *args: None
+    locale_data = [_process_local_data(support, srcdir, filename)
+                   for filename in inputs['locales']]
+    payloads = [dict(data, _schema=import_cldr.DATA_SCHEMA_VERSION) for data in locale_data]
+
+    def plural_tokenize():
+        for rule in rule_strings:
+            tokenize_rule(rule)
+
+    def plural_parse():
+        for rules in plural_rules:
+            PluralRule(rules)
+
+    def number_patterns():
+        for pattern in inputs['number_patterns']:
+            cldr_numbers.parse_pattern(pattern)
+
+    def date_patterns():
+        for pattern in inputs['date_patterns']:
+            cldr_dates.parse_pattern(pattern)
+
+    def interval_split():
+        for pattern in inputs['interval_patterns']:
+            cldr_dates.split_interval_pattern(pattern)
+
+    def global_import():
+        parse_global(srcdir, sup)
+
+    def locale_import():
+        for filename in inputs['locales']:
+            _process_local_data(support, srcdir, filename)
+
+    def serialize_binary():
+        for payload in payloads:
+            packb(payload, default=binary_repr)
+
+    def serialize_json():
+        for data in locale_data:
+            json.dumps(data, indent=2, default=debug_repr, ensure_ascii=False)
+
+    return [
+        ('plural_tokenize', len(rule_strings), plural_tokenize),
+        ('plural_parse', len(plural_rules), plural_parse),
+        ('number_pattern_parse', len(inputs['number_patterns']), number_patterns),
+        ('date_pattern_parse', len(inputs['date_patterns']), date_patterns),
+        ('interval_split', len(inputs['interval_patterns']), interval_split),
+        ('global_import', 1, global_import),
+        ('locale_import', len(inputs['locales']), locale_import),
+        ('serialize_binary', len(payloads), serialize_binary),
+        ('serialize_json', len(locale_data), serialize_json),
+    ]
+
+
+def clear_caches():
+    for cache in caches.values():
+        cache.clear()
+
+
+def summarize(times):
+    """Return the statistical summary of a list of times."""
+    times = sorted(times)
+    count = len(times)
+    mean = sum(times) / count
+    middle = count // 2
+    median = times[middle] if count % 2 else (times[middle - 1] + times[middle]) / 2
+    stdev = math.sqrt(sum((t - mean) ** 2 for t in times) / (count - 1)) if count > 1 else 0.0
+    return {'min': times[0], 'median': median, 'mean': mean, 'stdev': stdev, 'runs': count}
+
+
+def run_benchmark(func, operations, repeat):
+    """Time `func` `repeat` times, each run calling it often enough to last
+    at least `MIN_RUN_TIME`, and return the summary of the time per
+    operation."""
+    def run(number):
+        total = 0.0
+        for _ in range(number):
+            clear_caches()
+            start = timeit.default_timer()
+            func()
+            total += timeit.default_timer() - start
+        return total
+
+    number = 1
+    while run(number) < MIN_RUN_TIME:
+        number *= 2
+    times = [run(number) / (number * operations) for _ in range(repeat)]
+    result = summarize(times)
+    result['operations'] = operations
+    result['loops'] = number
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Return the lines of the comparison of `results` with the `baseline`
+    results, and whether some benchmark got slower by more than
+    `threshold` (a fraction of the baseline median)."""
+    lines = []
+    regressed = False
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            lines.append('%-22s %12s' % (name, 'new'))
+            continue
+        ratio = result['median'] / base['median']
+        verdict = ''
+        if ratio > 1 + threshold:
+            verdict = 'slower'
+            regressed = True
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        lines.append('%-22s %10.2fus %10.2fus %7.2fx  %s' % (
+            name, base['median'] * 1e6, result['median'] * 1e6, ratio, verdict))
+    return lines, regressed
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [path/to/cldr/common]')
+    parser.add_option(
+        '-r', '--repeat', dest='repeat', type='int', default=7,
+        help='number of timed runs per benchmark (default %default)'
+    )
+    parser.add_option(
+        '-k', dest='select', metavar='NAMES',
+        help='only run the comma-separated benchmarks NAMES'
+    )
+    parser.add_option(
+        '--save', dest='save', metavar='FILE',
+        help='write the results to FILE as JSON'
+    )
+    parser.add_option(
+        '--compare', dest='compare', metavar='FILE',
+        help='compare the results with the baseline saved in FILE'
+    )
+    parser.add_option(
+        '--threshold', dest='threshold', type='float', default=0.1,
+        help='relative slowdown reported as a regression (default %default)'
+    )
+    options, args = parser.parse_args()
+    if len(args) > 1:
+        parser.error('incorrect number of arguments')
+    srcdir = args[0] if args else FIXTURES_DIR
+
+    benchmarks = make_benchmarks(srcdir)
+    if options.select:
+        selected = set(options.select.split(','))
+        unknown = selected - set(name for name, _, _ in benchmarks)
+        if unknown:
+            parser.error('unknown benchmarks: %s' % ', '.join(sorted(unknown)))
+        benchmarks = [benchmark for benchmark in benchmarks if benchmark[0] in selected]
+
+    results = {}
+    print('%-22s %6s %12s %12s %12s %8s' % ('benchmark', 'ops', 'min', 'median',
+                                            'mean', 'stdev'))
+    for name, operations, func in benchmarks:
+        result = results[name] = run_benchmark(func, operations, options.repeat)
+        print('%-22s %6d %10.2fus %10.2fus %10.2fus %7.1f%%' % (
+            name, operations, result['min'] * 1e6, result['median'] * 1e6,
+            result['mean'] * 1e6, 100 * result['stdev'] / result['mean']))
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'srcdir': os.path.abspath(srcdir),
+                'benchmarks': results,
+            }, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)['benchmarks']
+        lines, regressed = compare(results, baseline, options.threshold)
+        print('')
+        print('%-22s %12s %12s %8s' % ('benchmark', 'baseline', 'current', 'ratio'))
+        for line in lines:
+            print(line)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    bench_numbers
+    ~~~~~~~~~~~~~~~~
+    Benchmark of `cldr_numbers.NumberFormatter.format_array` against the
+    scalar `NumberFormatter.format_many` on large random arrays, checking
+    that both produce the same strings, on those arrays and on values that
+    need the exact scalar path (tiny, huge and non-finite floats, integers
+    near the limits of int64).  Requires NumPy.
+
+    Usage: ``bench_numbers.py [-s SIZE]``
+"""
+from optparse import OptionParser
+import sys
+import time
+
+import numpy
+
+from cldr_numbers import NumberFormatter, parse_pattern
+
+PATTERNS = (u'#,##0.###', u'#,##,##0.00;(#,##,##0.00)', u'#,##0%')
+SYMBOLS = {'group': u' ', 'decimal': u','}
+
+#: Values the array arithmetic can not handle by itself
+EDGE_FLOATS = (7.92e-07, 1e-07, 1e-20, -5e-324, 0.0, -0.0, 0.5, 2.5, 0.0005, 1e15 + 0.5,
+               2.0 ** 53, 2.0 ** 63, float(10 ** 40), 1e300, -1e300,
+               float('inf'), float('-inf'), float('nan'))
+EDGE_INTS = (0, -1, 2 ** 53 + 1, 2 ** 62, -2 ** 63, 2 ** 63 - 1)
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option(
+        '-s', '--size', dest='size', type='int', default=1000000,
+        help='number of values per array (default %default)'
+    )
+    options, args = parser.parse_args()
+    if args:
+        parser.error('incorrect number of arguments')
+
+    random = numpy.random.RandomState(42)
+    arrays = [
+        ('int', random.randint(-10 ** 9, 10 ** 9, options.size)),
+        ('float', random.standard_normal(options.size) * 10 ** random.randint(0, 7, options.size)),
+    ]
+    edges = [('float', numpy.array(EDGE_FLOATS)), ('int', numpy.array(EDGE_INTS, numpy.int64))]
+    print('%d values per array' % options.size)
+    for pattern in PATTERNS:
+        formatter = NumberFormatter(parse_pattern(pattern), SYMBOLS)
+        for kind, values in edges:
+            if formatter.format_array(values) != formatter.format_many(values.tolist()):
+                sys.exit('results differ for %r on %s edge values' % (pattern, kind))
+        for kind, values in arrays:
+            vectorized, array_time = timed(formatter.format_array, values)
+            scalar, scalar_time = timed(formatter.format_many, values.tolist())
+            if vectorized != scalar:
+                sys.exit('results differ for %r on %s values' % (pattern, kind))
+            print('%-26s %-5s  scalar %7.3fs  array %7.3fs  speedup %6.1fx' % (
+                pattern, kind, scalar_time, array_time, scalar_time / array_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    bench_plural
+    ~~~~~~~~~~~~~~~~
+    Benchmark of `plural.PluralRule.evaluate_array` against calling the rule
+    once per number, checking that both select the same categories.
+    Requires NumPy.
+
+    Usage: ``bench_plural.py [-s SIZE]``
+"""
+from optparse import OptionParser
+import sys
+import time
+
+import numpy
+
+from plural import PluralRule, _plural_tags
+
+RULES = {
+    'one': 'v = 0 and i % 10 = 1 and i % 100 != 11',
+    'few': 'v = 0 and i % 10 = 2..4 and i % 100 != 12..14',
+    'many': 'v = 0 and i % 10 = 0 or v = 0 and i % 10 = 5..9 or '
+            'v = 0 and i % 100 = 11..14',
+}
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option(
+        '-s', '--size', dest='size', type='int', default=1000000,
+        help='number of values per array (default %default)'
+    )
+    options, args = parser.parse_args()
+    if args:
+        parser.error('incorrect number of arguments')
+
+    rule = PluralRule(RULES)
+    random = numpy.random.RandomState(42)
+    arrays = [
+        ('int', random.randint(0, 10 ** 6, options.size)),
+        ('float', numpy.round(random.uniform(0, 1000, options.size), 2)),
+    ]
+    print('%d values per array' % options.size)
+    for kind, values in arrays:
+        codes, array_time = timed(rule.evaluate_array, values)
+        tags, scalar_time = timed(lambda: [rule(value) for value in values.tolist()])
+        if [_plural_tags[code] for code in codes.tolist()] != tags:
+            sys.exit('categories differ for %s values' % kind)
+        print('%-5s  scalar %7.3fs  array %7.3fs  speedup %6.1fx' % (
+            kind, scalar_time, array_time, scalar_time / array_time))
+
+
+if __name__ == '__main__':
+    main()
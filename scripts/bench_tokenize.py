@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    bench_tokenize
+    ~~~~~~~~~~~~~~~~
+    Micro-benchmark of `cldr_dates.tokenize_pattern` over every date, time
+    and interval pattern of a CLDR checkout, against the previous
+    implementation of the tokenizer (kept here for comparison).
+
+    Usage: ``bench_tokenize.py path/to/cldr/common``
+"""
+from optparse import OptionParser
+import os
+import sys
+import timeit
+
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+from cldr_dates import PATTERN_CHARS, tokenize_pattern
+
+PATTERN_TAGS = ('pattern', 'dateFormatItem', 'greatestDifference',
+                'intervalFormatFallback')
+
+
+def legacy_tokenize_pattern(pattern):
+    result = []
+    quotebuf = None
+    charbuf = []
+    fieldchar = ['']
+    fieldnum = [0]
+
+    def append_chars():
+        result.append(('chars', ''.join(charbuf).replace('\0', "'")))
+        del charbuf[:]
+
+    def append_field():
+        result.append(('field', (fieldchar[0], fieldnum[0])))
+        fieldchar[0] = ''
+        fieldnum[0] = 0
+
+    for idx, char in enumerate(pattern.replace("''", '\0')):
+        if quotebuf is None:
+            if char == "'":  # quote started
+                if fieldchar[0]:
+                    append_field()
+                elif charbuf:
+                    append_chars()
+                quotebuf = []
+            elif char in PATTERN_CHARS:
+                if charbuf:
+                    append_chars()
+                if char == fieldchar[0]:
+                    fieldnum[0] += 1
+                else:
+                    if fieldchar[0]:
+                        append_field()
+                    fieldchar[0] = char
+                    fieldnum[0] = 1
+            else:
+                if fieldchar[0]:
+                    append_field()
+                charbuf.append(char)
+
+        elif quotebuf is not None:
+            if char == "'":  # end of quote
+                charbuf.extend(quotebuf)
+                quotebuf = None
+            else:  # inside quote
+                quotebuf.append(char)
+
+    if fieldchar[0]:
+        append_field()
+    elif charbuf:
+        append_chars()
+
+    return result
+
+
+def collect_patterns(srcdir):
+    """Return the distinct date/time patterns of all locales in `srcdir`."""
+    patterns = set()
+    maindir = os.path.join(srcdir, 'main')
+    for filename in sorted(os.listdir(maindir)):
+        if not filename.endswith('.xml'):
+            continue
+        tree = ElementTree.parse(os.path.join(maindir, filename))
+        for calendar in tree.iter('calendar'):
+            for elem in calendar.iter():
+                if elem.tag in PATTERN_TAGS and elem.text:
+                    patterns.add(elem.text)
+    return sorted(patterns)
+
+
+def main():
+    parser = OptionParser(usage='%prog path/to/cldr/common')
+    parser.add_option(
+        '-n', '--number', dest='number', type='int', default=20,
+        help='number of passes over all patterns (default %default)'
+    )
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('incorrect number of arguments')
+
+    patterns = collect_patterns(args[0])
+    tokenize = tokenize_pattern.__wrapped__  # bypass the cache
+
+    for pattern in patterns:
+        if tokenize(pattern) != legacy_tokenize_pattern(pattern):
+            sys.exit('token streams differ for %r' % pattern)
+
+    def run(func):
+        return lambda: [func(pattern) for pattern in patterns]
+
+    legacy = min(timeit.repeat(run(legacy_tokenize_pattern), number=options.number, repeat=3))
+    current = min(timeit.repeat(run(tokenize), number=options.number, repeat=3))
+    calls = options.number * len(patterns)
+    print('%d distinct patterns, %d calls per run' % (len(patterns), calls))
+    print('legacy tokenizer:  %8.2f us/pattern' % (legacy / calls * 1e6))
+    print('current tokenizer: %8.2f us/pattern' % (current / calls * 1e6))
+    print('speedup:           %8.2fx' % (legacy / current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+    bundle
+    ~~~~~~~~~~~~~~~~
+    A single packed file holding the binary data of every locale.
+
+    Layout (all integers little-endian)::
+
+        header   magic ``b'GLZB'``, u16 bundle version, u16 data schema
+                 version, u32 entry count, u32 reserved
+        index    one 16-byte record per entry, sorted by name:
+                 u32 name offset, u16 name length, u16 reserved,
+                 u32 payload offset, u32 payload length
+        names    the UTF-8 entry names
+        payloads the MessagePack payload of every entry
+
+    Offsets are relative to the start of the file, so the bundle can be
+    memory-mapped and a single locale decoded without reading the others.
+    The global data is stored under the name ``'global'``.
+
+    The payloads are deduplicated (see `dedup`): the string table and the
+    shared subtrees they refer to are stored in the entries ``'_strings'``
+    and ``'_shared'``, a MessagePack array of strings and one of binary
+    blobs respectively.
+"""
+import mmap
+import os
+import struct
+
+from dedup import Resolver
+from packdata import packb, unpackb
+
+MAGIC = b'GLZB'
+
+#: Bumped whenever the layout of the bundle changes
+BUNDLE_VERSION = 2
+
+GLOBAL_ENTRY = 'global'
+STRINGS_ENTRY = '_strings'
+SHARED_ENTRY = '_shared'
+
+_header = struct.Struct('<4sHHII')
+_record = struct.Struct('<IHHII')
+
+
+def write_bundle(path, entries, schema_version, strings=(), shared=()):
+    """Write a bundle file.
+
+    :param path: destination file name
+    :param entries: dict mapping entry names to their MessagePack payloads
+    :param schema_version: version of the data schema of the payloads
+    :param strings: the string table the payloads refer to
+    :param shared: the encoded shared subtrees the payloads refer to
+    """
+    entries = dict(entries)
+    entries[STRINGS_ENTRY] = packb(list(strings))
+    entries[SHARED_ENTRY] = packb(list(shared))
+    names = sorted(entries, key=lambda name: name.encode('utf-8'))
+    encoded_names = [name.encode('utf-8') for name in names]
+    name_offset = _header.size + _record.size * len(names)
+    data_offset = name_offset + sum(len(name) for name in encoded_names)
+
+    index = []
+    for name, encoded_name in zip(names, encoded_names):
+        index.append(_record.pack(name_offset, len(encoded_name), 0,
+                                  data_offset, len(entries[name])))
+        name_offset += len(encoded_name)
+        data_offset += len(entries[name])
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_header.pack(MAGIC, BUNDLE_VERSION, schema_version, len(names), 0))
+        f.write(b''.join(index))
+        f.write(b''.join(encoded_names))
+        for name in names:
+            f.write(entries[name])
+    os.rename(tmp_path, path)
+
+
+class Bundle(object):
+    """Read-only access to a bundle file through a memory map.
+
+    Data that is shared between entries is decoded only once, so the
+    returned data must not be modified.
+
+    >>> bundle = Bundle('cldr/cldr.bundle')            # doctest: +SKIP
+    >>> bundle.load('en_GB')['date_formats']['full']   # doctest: +SKIP
+    {'pattern': 'EEEE, d MMMM y', 'format': '%(EEEE)s, %(d)s %(MMMM)s %(y)s'}
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.schema_version, self._count, _ = \
+            _header.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a locale data bundle' % filename)
+        if version != BUNDLE_VERSION:
+            raise ValueError('unsupported bundle version %d' % version)
+        self._resolver = Resolver(self._load_table(STRINGS_ENTRY),
+                                  self._load_table(SHARED_ENTRY))
+
+    def _load_table(self, name):
+        record = self._find(name)
+        if record is None:
+            return []
+        return unpackb(self._map, record[3])
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.names())
+
+    def __contains__(self, name):
+        return not name.startswith('_') and self._find(name) is not None
+
+    def _record(self, idx):
+        return _record.unpack_from(self._map, _header.size + idx * _record.size)
+
+    def _name(self, record):
+        return self._map[record[0]:record[0] + record[1]]
+
+    def _find(self, name):
+        key = name.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self._record(mid)
+            found = self._name(record)
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return record
+        return None
+
+    def names(self):
+        """Return the names of all data entries, in index order."""
+        names = [self._name(self._record(idx)).decode('utf-8')
+                 for idx in range(self._count)]
+        return [name for name in names if not name.startswith('_')]
+
+    def raw(self, name):
+        """Return the encoded payload of `name` as a zero-copy memoryview.
+        The payload may refer to the string and shared subtree tables.
+
+        :raise KeyError: if there is no such entry
+        """
+        record = self._find(name)
+        if record is None:
+            raise KeyError(name)
+        return memoryview(self._map)[record[3]:record[3] + record[4]]
+
+    def load(self, name):
+        """Decode the data of the locale (or ``'global'``) entry `name`.
+
+        :raise KeyError: if there is no such entry
+        """
+        record = self._find(name)
+        if record is None:
+            raise KeyError(name)
+        return self._resolver.unpackb(self._map, record[3])
+
+
+def main():
+    from optparse import OptionParser
+    from pprint import pprint
+
+    parser = OptionParser(usage='%prog path/to/cldr.bundle [name [key.path]]')
+    options, args = parser.parse_args()
+    if len(args) not in (1, 2, 3):
+        parser.error('incorrect number of arguments')
+
+    with Bundle(args[0]) as bundle:
+        if len(args) == 1:
+            for name in bundle.names():
+                print('%-20s %8d' % (name, len(bundle.raw(name))))
+            print('%d shared strings, %d shared subtrees' % (
+                len(bundle._resolver.strings), len(bundle._resolver.shared)))
+            return
+        data = bundle.load(args[1])
+        if len(args) > 2:
+            for key in args[2].split('.'):
+                data = data[key]
+        pprint(data)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    check_plural
+    ~~~~~~~~~~~~~~~~
+    Differential check of the plural rule evaluators on the ``@integer`` and
+    ``@decimal`` samples of a CLDR checkout.
+
+    Every rule set of ``plurals.xml`` and ``ordinals.xml`` is evaluated on
+    its expanded samples by the reference interpreter (`plural.interpret`),
+    which must agree with the category the samples are listed under, and by
+    each faster evaluator, which must agree with the interpreter:
+
+    - ``python``: the rules compiled to Python by `plural.to_python`
+    - ``class``: the compiled rules of the equivalence class the importer
+      puts the rule set in (see `import_cldr._extract_plural_rules`)
+    - ``numpy``: the array evaluation of `plural.to_numpy`, if NumPy is
+      installed
+
+    The samples are evaluated both as `decimal.Decimal` values, which keep
+    trailing fraction zeros, and as floats.  The Rust rules are checked on
+    the same samples by the tests of ``src/plural.rs``.
+
+    Usage: ``check_plural.py [-b] path/to/cldr/common``
+"""
+from optparse import OptionParser
+import os
+import sys
+import timeit
+
+from import_cldr import _extract_plural_rules, iter_plural_rules
+from plural import _plural_tags, interpret, sample_vectors, to_numpy, to_python
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PLURAL_FILES = ('plurals.xml', 'ordinals.xml')
+
+
+def evaluators(rule, representative):
+    """Return the ``(name, function)`` pairs of the evaluators of `rule`; the
+    functions take a list of numbers and return the list of their tags."""
+    compiled = to_python(rule)
+    compiled_class = to_python(representative)
+    result = [
+        ('reference', lambda values: [interpret(rule, value) for value in values]),
+        ('python', lambda values: [compiled(value) for value in values]),
+        ('class', lambda values: [compiled_class(value) for value in values]),
+    ]
+    if numpy is not None:
+        vectorized = to_numpy(rule)
+
+        def evaluate_array(values):
+            if all(isinstance(value, float) for value in values):
+                values = numpy.array(values, numpy.float64)
+            else:
+                values = numpy.array(values, object)
+            return [_plural_tags[code] for code in vectorized(values).tolist()]
+        result.append(('numpy', evaluate_array))
+    return result
+
+
+def check_rule(rule, representative, vectors):
+    """Return the failures of the evaluators of `rule` on the test vectors as
+    ``(evaluator, number, expected, got)`` tuples."""
+    failures = []
+    numbers = [value for value, tag in vectors]
+    reference = [interpret(rule, value) for value in numbers]
+    failures.extend(('samples', value, tag, got)
+                    for (value, tag), got in zip(vectors, reference) if tag != got)
+    floats = [float(value) for value in numbers]
+    float_reference = [interpret(rule, value) for value in floats]
+    for name, evaluate in evaluators(rule, representative)[1:]:
+        for values, expected in ((numbers, reference), (floats, float_reference)):
+            failures.extend((name, value, want, got)
+                            for value, want, got in zip(values, expected, evaluate(values))
+                            if want != got)
+    return failures
+
+
+def benchmark_rule(rule, representative, vectors, size):
+    """Return the throughput of each evaluator of `rule`, in numbers per
+    second, on the samples repeated to `size` floats."""
+    values = [float(value) for value, tag in vectors]
+    values = (values * (size // len(values) + 1))[:size]
+    result = []
+    for name, evaluate in evaluators(rule, representative):
+        seconds = min(timeit.repeat(lambda: evaluate(values), number=1, repeat=3))
+        result.append((name, size / seconds))
+    return result
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] path/to/cldr/common')
+    parser.add_option(
+        '-b', '--benchmark', dest='benchmark', action='store_true',
+        help='report the throughput of every evaluator per rule set'
+    )
+    parser.add_option(
+        '-s', '--size', dest='size', type='int', default=20000,
+        help='number of values per benchmark run (default %default)'
+    )
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('incorrect number of arguments')
+
+    failed = False
+    for filename in PLURAL_FILES:
+        path = os.path.join(args[0], 'supplemental', filename)
+        classes = _extract_plural_rules(path)
+        for locales, rule in iter_plural_rules(path):
+            vectors = sample_vectors(rule)
+            representative = classes[locales[0]]
+            label = '%s %s' % (filename, ' '.join(locales[:4]) + (' ...' if len(locales) > 4 else ''))
+            failures = check_rule(rule, representative, vectors)
+            for name, value, expected, got in failures:
+                print('%s: %s gives %r for %s, expected %r' % (label, name, got, value, expected))
+            failed = failed or bool(failures)
+            if options.benchmark and vectors:
+                print('%s (%d samples)' % (label, len(vectors)))
+                for name, rate in benchmark_rule(rule, representative, vectors, options.size):
+                    print('    %-10s %12.0f numbers/s' % (name, rate))
+            elif not failures:
+                print('%s: %d samples ok' % (label, len(vectors)))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,9 @@
     :copyright: (c) 2013 by the Babel Team.
     :license: BSD, see LICENSE for more details.
 """
+import re
+
+from lrucache import LRUCache, memoize
 
 PATTERN_CHARS = {
     'G': [1, 2, 3, 4, 5],                                               # era
@@ -28,7 +31,13 @@ PATTERN_CHARS = {
 #: in order of decreasing magnitude.
 PATTERN_CHAR_ORDER = "GyYuUQqMLlwWdDFgEecabBChHKkjJmsSAzZOvVXx"
 
-_pattern_cache = {}
+#: A field op of a pattern program is the index of the field character in
+#: `PATTERN_CHAR_ORDER` shifted left by this many bits, or'ed with the width
+FIELD_SHIFT = 8
+
+_pattern_cache = LRUCache(name='cldr_dates.parse_pattern')
+_placeholder_re = re.compile(r'\{(\d)\}')
+_literal_stops = frozenset(PATTERN_CHARS) | frozenset("'")
 
 
 def untokenize_pattern(tokens):
@@ -50,6 +59,7 @@ def untokenize_pattern(tokens):
     return "".join(output)
 
 
+@memoize(LRUCache(name='cldr_dates.split_interval_pattern'), copy=list)
 def split_interval_pattern(pattern):
     """
     Split an interval-describing datetime pattern into multiple pieces.
@@ -85,6 +95,7 @@ def split_interval_pattern(pattern):
     return [untokenize_pattern(tokens) for tokens in parts]
 
 
+@memoize(LRUCache(name='cldr_dates.tokenize_pattern'), copy=list)
 def tokenize_pattern(pattern):
     """
     Tokenize date format patterns.
@@ -97,54 +108,50 @@ def tokenize_pattern(pattern):
     :rtype: list[tuple]
     """
     result = []
-    quotebuf = None
-    charbuf = []
-    fieldchar = ['']
-    fieldnum = [0]
-
-    def append_chars():
-        result.append(('chars', ''.join(charbuf).replace('\0', "'")))
-        del charbuf[:]
-
-    def append_field():
-        result.append(('field', (fieldchar[0], fieldnum[0])))
-        fieldchar[0] = ''
-        fieldnum[0] = 0
-
-    for idx, char in enumerate(pattern.replace("''", '\0')):
-        if quotebuf is None:
-            if char == "'":  # quote started
-                if fieldchar[0]:
-                    append_field()
-                elif charbuf:
-                    append_chars()
-                quotebuf = []
-            elif char in PATTERN_CHARS:
-                if charbuf:
-                    append_chars()
-                if char == fieldchar[0]:
-                    fieldnum[0] += 1
-                else:
-                    if fieldchar[0]:
-                        append_field()
-                    fieldchar[0] = char
-                    fieldnum[0] = 1
-            else:
-                if fieldchar[0]:
-                    append_field()
-                charbuf.append(char)
-
-        elif quotebuf is not None:
-            if char == "'":  # end of quote
-                charbuf.extend(quotebuf)
-                quotebuf = None
-            else:  # inside quote
-                quotebuf.append(char)
-
-    if fieldchar[0]:
-        append_field()
-    elif charbuf:
-        append_chars()
+    chars = []  # pieces of the current literal run
+    pos = 0
+    end = len(pattern)
+
+    while pos < end:
+        char = pattern[pos]
+        run_end = pos + 1
+        if char in PATTERN_CHARS:
+            while run_end < end and pattern[run_end] == char:
+                run_end += 1
+            if chars:
+                result.append(('chars', ''.join(chars)))
+                chars = []
+            result.append(('field', (char, run_end - pos)))
+        elif char != "'":
+            while run_end < end and pattern[run_end] not in _literal_stops:
+                run_end += 1
+            chars.append(pattern[pos:run_end])
+        elif pattern[run_end:run_end + 1] == "'":  # escaped quote
+            chars.append("'")
+            run_end += 1
+        else:
+            # Quoted text; it joins the literal run that follows the quote.
+            if chars:
+                result.append(('chars', ''.join(chars)))
+                chars = []
+            quoted = []
+            while True:
+                quote_end = pattern.find("'", run_end)
+                if quote_end < 0:  # unterminated quotes are dropped
+                    run_end = end
+                    quoted = []
+                    break
+                quoted.append(pattern[run_end:quote_end])
+                run_end = quote_end + 1
+                if pattern[run_end:run_end + 1] != "'":
+                    break
+                quoted.append("'")  # escaped quote inside quotes
+                run_end += 1
+            chars.extend(quoted)
+        pos = run_end
+
+    if chars:
+        result.append(('chars', ''.join(chars)))
 
     return result
 
@@ -162,19 +169,31 @@ def parse_pattern(pattern):
     characters:
     >>> parse_pattern("hh' o''clock'").format
     u"%(hh)s o'clock"
+
+    The parsed pattern also holds the pattern as a program, see
+    `compile_pattern`.
     :param pattern: the formatting pattern to parse
     """
     if type(pattern) is DateTimePattern:
         return pattern
 
-    if pattern in _pattern_cache:
-        return _pattern_cache[pattern]
+    pat = _pattern_cache.get(pattern)
+    if pat is not None:
+        return pat
 
     result = []
+    program = []
 
     for tok_type, tok_value in tokenize_pattern(pattern):
         if tok_type == "chars":
             result.append(tok_value.replace('%', '%%'))
+            for idx, chars in enumerate(_placeholder_re.split(tok_value)):
+                if idx % 2:
+                    program.append(-1 - int(chars))
+                elif chars and program and not isinstance(program[-1], int):
+                    program[-1] += chars
+                elif chars:
+                    program.append(chars)
         elif tok_type == "field":
             fieldchar, fieldnum = tok_value
             limit = PATTERN_CHARS[fieldchar]
@@ -182,18 +201,59 @@ def parse_pattern(pattern):
                 raise ValueError('Invalid length for field: %r'
                                  % (fieldchar * fieldnum))
             result.append('%%(%s)s' % (fieldchar * fieldnum))
+            program.append(PATTERN_CHAR_ORDER.index(fieldchar) << FIELD_SHIFT | fieldnum)
         else:
             raise NotImplementedError("Unknown token type: %s" % tok_type)
 
-    _pattern_cache[pattern] = pat = DateTimePattern(pattern, u''.join(result))
+    _pattern_cache[pattern] = pat = DateTimePattern(pattern, u''.join(result), program)
     return pat
 
 
+def compile_pattern(pattern):
+    """Compile a date, time or datetime format pattern into a program: a flat
+    list of literal strings and integer ops, which a formatter can run in a
+    single loop without parsing anything.
+    >>> compile_pattern("H:mm' Uhr'")
+    [6145, ':', 7426, ' Uhr']
+
+    A non-negative op formats a field, see `FIELD_SHIFT`; a negative op
+    ``-1 - n`` stands for the ``{n}`` placeholder of datetime and interval
+    fallback patterns:
+    >>> compile_pattern("{1} 'at' {0}")
+    [-2, ' at ', -1]
+
+    Use `iter_program` to decode a program.
+    :param pattern: the formatting pattern to compile
+    """
+    return parse_pattern(pattern).program
+
+
+def iter_program(program):
+    """Decode a pattern program into ``(op_type, op_value)`` tuples.
+    ``op_type`` is "chars", "field" or "placeholder"; "field" values are
+    (field character, width) tuples as in ``tokenize_pattern``.
+    >>> list(iter_program([6145, ':', 7426, -1]))
+    [('field', ('H', 1)), ('chars', ':'), ('field', ('m', 2)), ('placeholder', 0)]
+
+    :type program: list
+    :rtype: Iterator[tuple]
+    """
+    mask = (1 << FIELD_SHIFT) - 1
+    for op in program:
+        if not isinstance(op, int):
+            yield 'chars', op
+        elif op < 0:
+            yield 'placeholder', -1 - op
+        else:
+            yield 'field', (PATTERN_CHAR_ORDER[op >> FIELD_SHIFT], op & mask)
+
+
 class DateTimePattern(object):
 
-    def __init__(self, pattern, format):
+    def __init__(self, pattern, format, program=None):
         self.pattern = pattern
         self.format = format
+        self.program = program
 
     def __repr__(self):
         return '<%s %r>' % (type(self).__name__, self.pattern)
@@ -8,6 +8,14 @@
 """
 import re
 
+from _compat import Context, Decimal, ROUND_HALF_EVEN, integer_types
+from lrucache import LRUCache, memoize
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 PREFIX_END = r'[^0-9@#.,]'
 NUMBER_TOKEN = r'[0-9@#.,E+]'
 
@@ -18,6 +26,36 @@ SUFFIX_PATTERN = r"(?P<suffix>.*)"
 number_re = re.compile(r"%s%s%s" % (PREFIX_PATTERN, NUMBER_PATTERN,
                                     SUFFIX_PATTERN))
 
+#: The number symbols of the root locale, used for symbols missing from the
+#: symbols passed to a `NumberFormatter`
+DEFAULT_SYMBOLS = {
+    'decimal': u'.',
+    'group': u',',
+    'percentSign': u'%',
+    'perMille': u'\u2030',
+    'plusSign': u'+',
+    'minusSign': u'-',
+    'exponential': u'E',
+    'infinity': u'\u221e',
+    'nan': u'NaN',
+}
+
+#: Decimal context of the rounding of the formatted numbers, replaced by a
+#: wider one for numbers with more digits (see `_context`)
+_CONTEXT = Context(prec=28)
+
+_affix_re = re.compile(u"'([^']*)'|([-+%\u2030\u00a4])")
+#: Padding character of the formatted numbers built by
+#: `NumberFormatter.format_array`; it never occurs in number symbols
+_ARRAY_FILL = u'\x01'
+
+_affix_symbols = {
+    u'-': 'minusSign',
+    u'+': 'plusSign',
+    u'%': 'percentSign',
+    u'\u2030': 'perMille',
+}
+
 
 def parse_grouping(p):
     """Parse primary and secondary digit grouping
@@ -40,6 +78,7 @@ def parse_grouping(p):
     return g1, g2
 
 
+@memoize(LRUCache(name='cldr_numbers.parse_pattern'))
 def parse_pattern(pattern):
     """Parse number format patterns"""
     def _match_number(pattern):
@@ -88,7 +127,16 @@ def parse_pattern(pattern):
 
     int_prec = parse_precision(integer)
     frac_prec = parse_precision(fraction)
+    mantissa_prec = None
     if exp:
+        # As in ICU, the mantissa has at most the minimum integer digits
+        # plus the maximum fraction digits significant digits, or all of
+        # them if that adds up to zero
+        mantissa_max = int_prec[0] + frac_prec[1]
+        mantissa_min = max(int_prec[0], 1) + frac_prec[0]
+        if mantissa_max:
+            mantissa_min = min(mantissa_min, mantissa_max)
+        mantissa_prec = (mantissa_min, mantissa_max)
         frac_prec = parse_precision(integer + fraction)
         exp_plus = exp.startswith('+')
         exp = exp.lstrip('+')
@@ -100,12 +148,12 @@ def parse_pattern(pattern):
     return NumberPattern(pattern, (pos_prefix, neg_prefix),
                          (pos_suffix, neg_suffix), grouping,
                          int_prec, frac_prec,
-                         exp_prec, exp_plus)
+                         exp_prec, exp_plus, mantissa_prec)
 
 
 class NumberPattern(object):
     def __init__(self, pattern, prefix, suffix, grouping,
-                 int_prec, frac_prec, exp_prec, exp_plus):
+                 int_prec, frac_prec, exp_prec, exp_plus, mantissa_prec=None):
         self.pattern = pattern
         self.prefix = prefix
         self.suffix = suffix
@@ -114,6 +162,7 @@ class NumberPattern(object):
         self.frac_prec = frac_prec
         self.exp_prec = exp_prec
         self.exp_plus = exp_plus
+        self.mantissa_prec = mantissa_prec
         if '%' in ''.join(self.prefix + self.suffix):
             self.scale = 2
         elif u'‰' in ''.join(self.prefix + self.suffix):
@@ -123,3 +172,347 @@ class NumberPattern(object):
 
     def __repr__(self):
         return '<%s %r>' % ('NumberPattern', self.pattern)
+
+    def apply(self, value, symbols, currency=None):
+        """Format `value` with this pattern and the given number symbols.
+        For formatting many values use a `NumberFormatter`, which does the
+        per-pattern work only once.
+        >>> print(parse_pattern(u'#,##0.##').apply(1234.5, {'group': u' '}))
+        1 234.5
+        """
+        return NumberFormatter(self, symbols, currency)(value)
+
+
+class NumberFormatter(object):
+    """Formats numbers according to a `NumberPattern` and the number symbols
+    of a locale.
+
+    Everything that only depends on the pattern and the symbols, such as
+    the affixes with their symbols substituted and the rounding precision,
+    is computed once when the formatter is created.  Integers are formatted
+    without going through `Decimal` whenever the pattern allows it.
+
+    >>> fmt = NumberFormatter(parse_pattern(u'#,##0.###'), {'decimal': u','})
+    >>> print(fmt(-1234567))
+    -1,234,567
+    >>> print(u' '.join(fmt.format_many([0.5, Decimal('1.2345'), 10 ** 6])))
+    0,5 1,234 1,000,000
+    >>> print(fmt(1e-07))
+    0
+    >>> print(fmt(float(10 ** 40)))
+    10,000,000,000,000,000,000,000,000,000,000,000,000,000
+    >>> len(fmt(1e300)) == 301 + 100
+    True
+
+    Scientific patterns show as many significant digits as ICU does:
+
+    >>> print(NumberFormatter(parse_pattern(u'#E0'), {})(1234))
+    1.234E3
+    >>> print(NumberFormatter(parse_pattern(u'##0.###E0'), {})(123456.789))
+    123.5E3
+
+    :param pattern: the `NumberPattern` to format with
+    :param symbols: the ``number_symbols`` of the locale; missing symbols
+                    are taken from `DEFAULT_SYMBOLS`
+    :param currency: the text substituted for the currency sign, if any
+    """
+
+    def __init__(self, pattern, symbols, currency=None):
+        self.pattern = pattern
+        self.symbols = symbols = dict(DEFAULT_SYMBOLS, **symbols)
+        if currency is None:
+            currency = u'\u00a4'
+
+        def substitute(match):
+            if match.group(2) is None:
+                return match.group(1) or u"'"
+            if match.group(2) == u'\u00a4':
+                return currency
+            return symbols[_affix_symbols[match.group(2)]]
+
+        self.prefix = [_affix_re.sub(substitute, affix) for affix in pattern.prefix]
+        self.suffix = [_affix_re.sub(substitute, affix) for affix in pattern.suffix]
+        self.group = symbols['group']
+        self.decimal = symbols['decimal']
+        self.scale = pattern.scale
+        self.frac_min, self.frac_max = pattern.frac_prec
+        # Values are rounded before they are scaled
+        self.quantum = Decimal(1).scaleb(-self.frac_max - self.scale)
+        self.significant = '@' in pattern.pattern
+        self.scientific = bool(pattern.exp_prec)
+        # Integers are exact, so they can skip Decimal if there are no
+        # fraction digits to show.
+        self.int_fast_path = not (self.scientific or self.significant or
+                                  self.frac_min)
+        # Python's own thousands separator does the common grouping
+        self.builtin_grouping = (tuple(pattern.grouping) == (3, 3) and
+                                 pattern.int_prec[0] <= 1)
+
+    def __call__(self, value):
+        if isinstance(value, integer_types) and self.int_fast_path:
+            value *= 10 ** self.scale
+            negative = value < 0
+            if self.builtin_grouping:
+                number = format(abs(value), ',')
+                if self.group != ',':
+                    number = number.replace(',', self.group)
+            else:
+                number = self._format_int(str(abs(value)))
+            return u'%s%s%s' % (self.prefix[negative], number, self.suffix[negative])
+
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+        negative = int(value.is_signed())
+        if value.is_nan():
+            return self.symbols['nan']
+        if value.is_infinite():
+            number = self.symbols['infinity']
+        elif self.scientific:
+            number = self._format_scientific(_scaleb(value.copy_abs(), self.scale))
+        elif self.significant:
+            number = self._format_significant(_scaleb(value.copy_abs(), self.scale),
+                                              *self.pattern.int_prec)
+            integer, sep, fraction = number.partition('.')
+            number = self._format_int(integer, 0)
+            if sep:
+                number += self.decimal + fraction
+        else:
+            rounded = _quantize(value.copy_abs(), self.quantum)
+            if self.scale:
+                rounded = rounded.scaleb(self.scale, _context(
+                    rounded.adjusted() + self.frac_max + self.scale + 1))
+            number = str(rounded)
+            if 'E' in number:
+                number = format(rounded, 'f')
+            integer, _, fraction = number.partition('.')
+            number = self._format_int(integer) + self._format_frac(fraction)
+        return u'%s%s%s' % (self.prefix[negative], number, self.suffix[negative])
+
+    def format_many(self, values):
+        """Format a sequence of numbers, returning a list of strings."""
+        return [self(value) for value in values]
+
+    def format_array(self, values):
+        """Format a NumPy array of ints or floats, returning a list of strings
+        equal to ``format_many(values.ravel().tolist())``.
+
+        Rounding, splitting into integer and fraction digits and grouping
+        are done with array operations on all values at once.  Floats the
+        array arithmetic can not round exactly like `Decimal` does (near
+        ties, very large or non-finite values) are formatted one by one, and
+        so are all values of significant digit and scientific patterns.
+        Requires NumPy.
+
+        :param values: a NumPy array, or anything `numpy.asarray` accepts
+        """
+        if numpy is None:
+            raise ImportError('NumberFormatter.format_array requires NumPy')
+        values = numpy.asarray(values).ravel()
+        if (values.dtype.kind not in 'iuf' or self.scientific or
+                self.significant or not len(values)):
+            return self.format_many(values.tolist())
+        exp = self.scale + self.frac_max
+
+        if values.dtype.kind == 'f':
+            values = values.astype(numpy.float64)
+            with numpy.errstate(over='ignore', invalid='ignore'):
+                magnitude = numpy.abs(values * 10.0 ** exp)
+                # Decimal rounds the shortest repr of each float, the array
+                # the float itself: they only disagree close to a tie.
+                tie_distance = numpy.abs(magnitude - numpy.trunc(magnitude) - 0.5)
+                exact = ((magnitude < 2.0 ** 53) &
+                         (tie_distance > 4 * numpy.spacing(magnitude)))
+            magnitude = numpy.where(exact, numpy.rint(magnitude), 0).astype(numpy.uint64)
+            negative = numpy.signbit(values)
+        else:
+            largest = max(abs(int(values.min())), abs(int(values.max())))
+            if largest * 10 ** exp >= 2 ** 63:
+                return self.format_many(values.tolist())
+            scaled = values.astype(numpy.int64) * 10 ** exp
+            magnitude = numpy.abs(scaled).astype(numpy.uint64)
+            negative = scaled < 0
+            exact = None
+
+        result = self._assemble_array(magnitude, negative)
+        if exact is not None:
+            for idx in numpy.flatnonzero(~exact):
+                result[idx] = self(values[idx].item())
+        return result
+
+    def _assemble_array(self, magnitude, negative):
+        """Build the formatted strings of the rounded values times
+        ``10 ** frac_max``, given as an array of non-negative integers.
+
+        The characters are built in a matrix, one column per value.  The
+        integer digits are right-aligned with the prefix just before them,
+        after `_ARRAY_FILL` padding that is stripped at the end; the
+        fraction digits are left-aligned with the suffix just after them,
+        padded with NULs which NumPy drops from strings.
+        """
+        count = len(magnitude)
+        if magnitude.max() < 2 ** 32:  # 32 bit division is faster
+            magnitude = magnitude.astype(numpy.uint32)
+        integer, fraction = numpy.divmod(magnitude, magnitude.dtype.type(10 ** self.frac_max))
+        int_min = self.pattern.int_prec[0]
+        width = max(len(str(int(integer.max()))), int_min)
+        int_len = numpy.ones(count, numpy.int64)
+        for power in range(1, width):
+            int_len += integer >= 10 ** power
+        int_len = numpy.maximum(int_len, int_min)
+        negative = negative.astype(numpy.intp)
+
+        def affix_table(affixes, pad):
+            size = max(map(len, affixes))
+            table = numpy.array([[ord(char) for char in affix.ljust(size + 1, pad)]
+                                 for affix in affixes], numpy.uint32)
+            return table.ravel(), size, negative * (size + 1)
+
+        def place(slots, lengths, affix, size, rows):
+            # Row `idx` holds slot `idx` for the values with more than `idx`
+            # slots shown, otherwise character ``idx - lengths`` of the affix.
+            shortest = lengths.min()
+            chars = numpy.empty((len(slots) + size, count), numpy.uint32)
+            for idx in range(len(chars)):
+                if idx < shortest:
+                    chars[idx] = slots[idx]
+                    continue
+                affix_char = affix.take(rows + numpy.minimum(idx - lengths, size), mode='clip')
+                if idx < len(slots):
+                    affix_char = numpy.where(idx < lengths, slots[idx], affix_char)
+                chars[idx] = affix_char
+            return chars
+
+        # The integer part, from the last digit leftwards: the digits and
+        # group separators, each with the digit count it shows from on.
+        slots = []
+        primary, secondary = self.pattern.grouping
+        remaining = integer
+        for power in range(width):
+            remaining, digit = numpy.divmod(remaining, remaining.dtype.type(10))
+            if power >= primary and (power - primary) % secondary == 0:
+                slots.extend((ord(char), power + 1) for char in reversed(self.group))
+            slots.append((digit + 48, power + 1))
+        shown_len = numpy.zeros(width + 1, numpy.int64)
+        for char, digits in slots:
+            shown_len[digits:] += 1
+        shown_len = shown_len[int_len]
+        # The prefix goes leftwards too, so it is reversed
+        reversed_prefix = [affix[::-1] for affix in self.prefix]
+        prefix, prefix_size, prefix_row = affix_table(reversed_prefix, _ARRAY_FILL)
+        head = place([char for char, digits in slots], shown_len, prefix, prefix_size, prefix_row)
+
+        # The decimal separator and fraction digits, then the suffix
+        slots = [ord(char) for char in self.decimal if self.frac_max]
+        for power in range(self.frac_max - 1, -1, -1):
+            slots.append(fraction // 10 ** power % 10 + 48)
+        frac_len = numpy.zeros(count, numpy.int64)
+        if self.frac_max:
+            frac_len += self.frac_max
+            for power in range(1, self.frac_max + 1):
+                frac_len -= fraction % 10 ** power == 0
+            frac_len = numpy.maximum(frac_len, self.frac_min)
+            frac_len = numpy.where(frac_len > 0, frac_len + len(self.decimal), 0)
+        suffix, suffix_size, suffix_row = affix_table(self.suffix, u'\0')
+        tail = place(slots, frac_len, suffix, suffix_size, suffix_row)
+
+        chars = numpy.concatenate((head[::-1], tail)).T.astype('<u4', order='C')
+        strings = chars.view('<U%d' % chars.shape[1]).ravel()
+        return numpy.char.lstrip(strings, _ARRAY_FILL).tolist()
+
+    def _format_int(self, digits, minimum=None):
+        if minimum is None:
+            minimum = self.pattern.int_prec[0]
+        if len(digits) < minimum:
+            digits = '0' * (minimum - len(digits)) + digits
+        primary, secondary = self.pattern.grouping
+        if len(digits) <= primary:
+            return digits
+        groups = [digits[-primary:]]
+        digits = digits[:-primary]
+        while len(digits) > secondary:
+            groups.append(digits[-secondary:])
+            digits = digits[:-secondary]
+        groups.append(digits)
+        return self.group.join(reversed(groups))
+
+    def _format_frac(self, digits):
+        digits = digits.rstrip('0')
+        if len(digits) < self.frac_min:
+            digits += '0' * (self.frac_min - len(digits))
+        if not digits:
+            return u''
+        return self.decimal + digits
+
+    def _format_significant(self, value, minimum, maximum):
+        """Format the non-negative `value` with at least `minimum` and at most
+        `maximum` (all if zero) significant digits."""
+        if not value:
+            return '0.' + '0' * (minimum - 1) if minimum > 1 else '0'
+        value = _round_significant(value, maximum)
+        exp = value.adjusted()
+        digits = ''.join(map(str, value.as_tuple().digits))[:maximum or None].ljust(minimum, '0')
+        digits = digits[:minimum] + digits[minimum:].rstrip('0')
+        # `digits` is now the significand, with the point after the first
+        # digit, of value = significand * 10 ** exp
+        if exp < 0:
+            return '0.' + '0' * (-exp - 1) + digits
+        if exp + 1 >= len(digits):
+            return digits + '0' * (exp + 1 - len(digits))
+        return digits[:exp + 1] + '.' + digits[exp + 1:]
+
+    def _format_scientific(self, value):
+        int_prec = self.pattern.int_prec
+        minimum, maximum = self.pattern.mantissa_prec
+        exp = 0
+        if value:
+            value = _round_significant(value, maximum)
+            exp = value.adjusted()
+            # Minimum number of integer digits
+            if int_prec[0] == int_prec[1]:
+                exp -= int_prec[0] - 1
+            # Exponent grouping
+            elif int_prec[1]:
+                exp = exp // int_prec[1] * int_prec[1]
+            value = _scaleb(value, -exp)
+        exp_sign = u''
+        if exp < 0:
+            exp_sign = self.symbols['minusSign']
+        elif self.pattern.exp_plus:
+            exp_sign = self.symbols['plusSign']
+        exp_digits = str(abs(exp))
+        exp_min = self.pattern.exp_prec[0]
+        if len(exp_digits) < exp_min:
+            exp_digits = '0' * (exp_min - len(exp_digits)) + exp_digits
+        return u'%s%s%s%s' % (
+            self._format_significant(value, minimum, maximum).replace('.', self.decimal),
+            self.symbols['exponential'], exp_sign, exp_digits)
+
+
+def _context(digits):
+    """Return a decimal context with a precision of at least `digits`."""
+    if digits <= _CONTEXT.prec:
+        return _CONTEXT
+    return Context(prec=digits)
+
+
+def _scaleb(value, exp):
+    """Return ``value * 10 ** exp``, exactly whatever the number of digits
+    of `value`."""
+    if not exp:
+        return value
+    return value.scaleb(exp, _context(len(value.as_tuple().digits)))
+
+
+def _quantize(value, quantum):
+    """Round `value` to a multiple of the power of ten `quantum`, half to
+    even.  The precision is that of the result, not the 28 digits of the
+    default context, so that values of any magnitude can be rounded."""
+    return value.quantize(quantum, ROUND_HALF_EVEN,
+                          _context(value.adjusted() - quantum.adjusted() + 2))
+
+
+def _round_significant(value, digits):
+    """Round the non-zero `value` to `digits` significant digits."""
+    if not digits:
+        return value
+    return _quantize(value, Decimal(1).scaleb(value.adjusted() - digits + 1))
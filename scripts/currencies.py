@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+    currencies
+    ~~~~~~~~~~~~~~~~
+    Date index of the currencies of every territory, searched by bisection,
+    and the reverse index of the territories of every currency.
+
+    The currency periods of a territory may overlap; the index splits the
+    time line at every ``from`` date and just after every ``to`` date, and
+    stores the currencies in use on each of the resulting intervals:
+
+    >>> index = currency_index({'DE': [('DEM', (1948, 6, 20), (2002, 2, 28), True),
+    ...                                ('EUR', (2002, 1, 1), None, True)]})
+    >>> index['territories']['DE']['bounds']
+    [0, 19480620, 20020101, 20020229]
+    >>> currencies = CurrencyIndex(index)
+    >>> currencies.currencies('DE', (2002, 2, 1))
+    ['DEM', 'EUR']
+    >>> currencies.territories('DEM')
+    ['DE']
+
+    Dates are stored as ``YYYYMMDD`` integers, which order like the dates; a
+    bound just after a ``to`` date is that integer plus one, which need not
+    be a valid date.
+"""
+from bisect import bisect_right
+import datetime
+
+
+def date_key(date):
+    """Return the ``YYYYMMDD`` integer of a date, given as a `datetime.date`
+    or as a ``(year, month, day)`` tuple, or ``None`` for ``None``.
+
+    >>> date_key((1999, 1, 1))
+    19990101
+    """
+    if date is None:
+        return None
+    if isinstance(date, tuple):
+        year, month, day = date
+    else:
+        year, month, day = date.year, date.month, date.day
+    return year * 10000 + month * 100 + day
+
+
+def currency_index(territory_currencies):
+    """Return the currency index as stored in the global data: for every
+    territory (``territories``), the sorted interval bounds (``bounds``)
+    and the ``[code, tender]`` pairs of the currencies in use from each
+    bound to the next (``currencies``), and for every currency
+    (``currencies``), its ``[territory, from, to, tender]`` periods with
+    inclusive bounds.
+
+    :param territory_currencies: the ``(code, from, to, tender)`` periods of
+                                 every territory, in order of preference
+    """
+    territories = {}
+    reverse = {}
+    for territory, periods in territory_currencies.items():
+        periods = [(code, date_key(start), date_key(end), tender)
+                   for code, start, end, tender in periods]
+        bounds = set([0])
+        for code, start, end, tender in periods:
+            if start is not None:
+                bounds.add(start)
+            if end is not None:
+                bounds.add(end + 1)
+            reverse.setdefault(code, []).append([territory, start, end, tender])
+        bounds = sorted(bounds)
+        territories[territory] = {
+            'bounds': bounds,
+            'currencies': [[[code, tender] for code, start, end, tender in periods
+                            if (start is None or start <= bound) and
+                            (end is None or bound <= end)]
+                           for bound in bounds],
+        }
+    for periods in reverse.values():
+        periods.sort(key=lambda period: (period[0], period[1] or 0))
+    return {'territories': territories, 'currencies': reverse}
+
+
+class CurrencyIndex(object):
+    """Answers currency queries on a `currency_index` with a binary search
+    per query.
+
+    :param index: the ``currency_index`` entry of the global data
+    """
+
+    def __init__(self, index):
+        self._territories = index['territories']
+        self._currencies = index['currencies']
+
+    def currencies(self, territory, date=None, tender=True, non_tender=False):
+        """Return the codes of the currencies in use in `territory` on
+        `date`, in order of preference.
+
+        :param territory: the territory code
+        :param date: a `datetime.date` or ``(year, month, day)`` tuple, or
+                     ``None`` for today
+        :param tender: whether to include legal tender currencies
+        :param non_tender: whether to include the other currencies
+        """
+        entry = self._territories.get(territory)
+        if not entry:
+            return []
+        key = date_key(date or datetime.date.today())
+        segment = entry['currencies'][bisect_right(entry['bounds'], key) - 1]
+        return [code for code, is_tender in segment
+                if (tender and is_tender) or (non_tender and not is_tender)]
+
+    def territories(self, currency, date=None):
+        """Return the sorted codes of the territories `currency` is in use
+        in on `date`, or ever if `date` is ``None``."""
+        key = date_key(date)
+        result = []
+        for territory, start, end, tender in self._currencies.get(currency, ()):
+            if key is None or ((start is None or start <= key) and
+                               (end is None or key <= end)):
+                if territory not in result:
+                    result.append(territory)
+        return result
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+    dedup
+    ~~~~~~~~~~~~~~~~
+    Structural deduplication of the locale data stored in a bundle.
+
+    Sibling locales repeat a lot of data verbatim: number symbols, formats,
+    display names, whole calendars.  `deduplicate` finds every dict or list
+    that occurs more than once across all entries and stores it only once,
+    in a table of shared subtrees, and collects repeated strings in a string
+    table.  The entries then refer to both tables with MessagePack extension
+    values holding the index of the shared item:
+
+    ``STRING_REF``
+        an index into the string table
+    ``SUBTREE_REF``
+        an index into the shared subtree table; a shared subtree may itself
+        contain references to strings and to other shared subtrees
+
+    Decoding an entry with `Resolver` turns the references back into the
+    strings and subtrees they stand for.  Every reference to the same item
+    yields the same object, so decoded data must be treated as read-only.
+"""
+import struct
+from itertools import chain
+
+from _compat import iteritems, text_type
+from packdata import ExtType, packb, unpackb
+
+STRING_REF = 1
+SUBTREE_REF = 2
+
+#: Repeated subtrees whose encoding is shorter than this are left inline
+MIN_SHARED_SIZE = 8
+
+_index_formats = {1: '>B', 2: '>H', 4: '>I'}
+
+
+def _ref(code, idx):
+    if idx <= 0xff:
+        return ExtType(code, struct.pack('>B', idx))
+    elif idx <= 0xffff:
+        return ExtType(code, struct.pack('>H', idx))
+    return ExtType(code, struct.pack('>I', idx))
+
+
+def _ref_size(idx):
+    return 3 if idx <= 0xff else 4 if idx <= 0xffff else 6
+
+
+class _Table(object):
+    """Assigns one number to every structurally distinct dict and list."""
+
+    def __init__(self):
+        self.numbers = {}
+        self.nodes = []
+        self.by_object = {}
+
+    def number(self, obj):
+        if isinstance(obj, dict):
+            key = (dict, tuple((self._key(k), self._key(v))
+                               for k, v in iteritems(obj)))
+        else:
+            key = (list, tuple(self._key(item) for item in obj))
+        num = self.numbers.get(key)
+        if num is None:
+            num = self.numbers[key] = len(self.nodes)
+            self.nodes.append(obj)
+        self.by_object[id(obj)] = num
+        return num
+
+    def _key(self, value):
+        if isinstance(value, (dict, list)):
+            return (None, self.number(value))
+        # The type is part of the key so that e.g. ``1``, ``1.0`` and
+        # ``True`` are told apart.
+        return (type(value), value)
+
+
+def deduplicate(entries):
+    """Deduplicate the decoded data of a set of bundle entries.
+
+    The entries are visited in the order of their names, so that the
+    tables do not depend on the order of `entries`.
+
+    :param entries: dict mapping entry names to their decoded data
+    :return: a ``(entries, strings, shared, stats)`` tuple: the encoded
+             entries, the string table, the encoded shared subtrees and a
+             dict with the sizes before and after deduplication
+    """
+    ordered = [entries[name] for name in sorted(entries)]
+    table = _Table()
+    for data in ordered:
+        table.number(data)
+
+    # Count how often every subtree is used, not descending into a subtree
+    # again once it has been seen: its children are then only counted once
+    # for all of its uses.
+    uses = [0] * len(table.nodes)
+
+    def count_uses(obj):
+        num = table.by_object[id(obj)]
+        uses[num] += 1
+        if uses[num] > 1:
+            return
+        for value in (obj.values() if isinstance(obj, dict) else obj):
+            if isinstance(value, (dict, list)):
+                count_uses(value)
+
+    for data in ordered:
+        count_uses(data)
+
+    shared = {}
+    for num, obj in enumerate(table.nodes):
+        if uses[num] > 1 and len(packb(obj)) >= MIN_SHARED_SIZE:
+            shared[num] = len(shared)
+
+    # Count the strings as they will appear in the encoded data: inside a
+    # shared subtree only once, no matter how often it is used.
+    string_uses = {}
+    seen = set()
+
+    def count_strings(obj):
+        num = table.by_object[id(obj)]
+        if num in shared:
+            if num in seen:
+                return
+            seen.add(num)
+        items = chain(obj, obj.values()) if isinstance(obj, dict) else obj
+        for item in items:
+            if isinstance(item, text_type):
+                string_uses[item] = string_uses.get(item, 0) + 1
+            elif isinstance(item, (dict, list)):
+                count_strings(item)
+
+    for data in ordered:
+        count_strings(data)
+
+    strings = []
+    string_index = {}
+    by_frequency = sorted(string_uses, key=lambda s: (-string_uses[s], s))
+    for string in by_frequency:
+        count = string_uses[string]
+        size = len(packb(string))
+        if count > 1 and (count - 1) * size > count * _ref_size(len(strings)):
+            string_index[string] = len(strings)
+            strings.append(string)
+
+    def encode(obj, top=False):
+        if isinstance(obj, text_type):
+            idx = string_index.get(obj)
+            return obj if idx is None else _ref(STRING_REF, idx)
+        if not isinstance(obj, (dict, list)):
+            return obj
+        if not top:
+            num = table.by_object[id(obj)]
+            if num in shared:
+                return _ref(SUBTREE_REF, shared[num])
+        if isinstance(obj, dict):
+            return dict((encode(k), encode(v)) for k, v in iteritems(obj))
+        return [encode(item) for item in obj]
+
+    encoded = {}
+    for name, data in entries.items():
+        encoded[name] = packb(encode(data, top=True))
+    shared_data = [None] * len(shared)
+    for num, idx in shared.items():
+        shared_data[idx] = packb(encode(table.nodes[num], top=True))
+
+    stats = {
+        'entries': len(entries),
+        'size': sum(len(packb(data)) for data in entries.values()),
+        'dedup_size': (sum(len(data) for data in encoded.values()) +
+                       len(packb(strings)) + len(packb(shared_data))),
+        'strings': len(strings),
+        'string_refs': sum(string_uses[s] for s in strings),
+        'subtrees': len(shared),
+        'subtree_refs': sum(uses[num] for num in shared),
+    }
+    return encoded, strings, shared_data, stats
+
+
+def format_stats(stats):
+    """Return a human readable report of the `stats` of `deduplicate`."""
+    saved = stats['size'] - stats['dedup_size']
+    return '\n'.join([
+        'Deduplicated %d entries: %d -> %d bytes (saved %d bytes, %.1f%%)' % (
+            stats['entries'], stats['size'], stats['dedup_size'], saved,
+            100.0 * saved / (stats['size'] or 1)),
+        '  %d shared strings, used %d times' % (
+            stats['strings'], stats['string_refs']),
+        '  %d shared subtrees, used %d times' % (
+            stats['subtrees'], stats['subtree_refs']),
+    ])
+
+
+class Resolver(object):
+    """Decodes deduplicated data, resolving the references to the string and
+    shared subtree tables.
+
+    :param strings: the string table
+    :param shared: the encoded shared subtrees; each is decoded on first use
+    """
+
+    def __init__(self, strings, shared):
+        self.strings = strings
+        self.shared = shared
+        self._decoded = {}
+
+    def unpackb(self, data, offset=0):
+        return unpackb(data, offset, ext_hook=self.ext_hook)
+
+    def ext_hook(self, code, data):
+        idx = struct.unpack(_index_formats[len(data)], data)[0]
+        if code == STRING_REF:
+            return self.strings[idx]
+        if code == SUBTREE_REF:
+            if idx not in self._decoded:
+                self._decoded[idx] = self.unpackb(self.shared[idx])
+            return self._decoded[idx]
+        raise ValueError('unknown extension type %d' % code)
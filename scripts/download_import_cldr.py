@@ -98,7 +98,8 @@ def main():
         sys.executable,
         os.path.join(scripts_path, 'import_cldr.py'),
         common_path,
-        '-j'])
+        '-j',
+        '--jobs=0'])
 
 
 if __name__ == '__main__':
@@ -17,12 +17,22 @@ import os
 import re
 import sys
 
-from _compat import pickle, text_type
-from plural import PluralRule
-from localedata import Alias
+from _compat import text_type
+from plural import PluralRule, canonical_form, sample_vectors, to_rust
+from localedata import Alias, merge, parent_locale, resolve_aliases
+from bundle import GLOBAL_ENTRY, Bundle, write_bundle
+from currencies import currency_index
+from dedup import deduplicate, format_stats
+from manifest import Manifest, read_revision
+from negotiation import minimal_table
+from packdata import packb, unpackb
+from profiling import format_report, stage, write_report
+from territories import Containment, containment_index, resolve_week_data
+from zones import zone_index
 
 import cldr_numbers
 import cldr_dates
+import profiling
 from cldr_dates import split_interval_pattern
 
 try:
@@ -37,12 +47,77 @@ CHECKOUT_ROOT = os.path.abspath(os.path.join(
 ))
 CLDR_ROOT = os.path.join(CHECKOUT_ROOT, "cldr")
 sys.path.insert(0, CHECKOUT_ROOT)
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#: Version of the layout of the binary (MessagePack) data files, stored in
+#: each of them under the `_schema` key
+DATA_SCHEMA_VERSION = 3
+
+#: File name of the packed bundle of all binary data, inside the destination
+BUNDLE_FILENAME = 'cldr.bundle'
+
+#: File name of the Rust source of the compiled plural rules, inside the
+#: destination; included by ``src/plural.rs``
+PLURAL_SOURCE_FILENAME = 'plurals.rs'
+
+#: Importer sources; a change to any of them invalidates all converted data
+IMPORTER_FILES = (
+    '_compat.py',
+    'bundle.py',
+    'cldr_dates.py',
+    'cldr_numbers.py',
+    'currencies.py',
+    'dedup.py',
+    'import_cldr.py',
+    'localedata.py',
+    'lrucache.py',
+    'manifest.py',
+    'negotiation.py',
+    'packdata.py',
+    'plural.py',
+    'profiling.py',
+    'territories.py',
+    'zones.py',
+)
+
+#: Source files (relative to the CLDR `common` directory) read by `parse_global`
+GLOBAL_INPUTS = (
+    'bcp47/timezone.xml',
+    'supplemental/likelySubtags.xml',
+    'supplemental/metaZones.xml',
+    'supplemental/supplementalData.xml',
+    'supplemental/supplementalMetadata.xml',
+    'supplemental/windowsZones.xml',
+)
+
+#: Source files of the plural rules compiled to Rust
+PLURAL_INPUTS = (
+    'supplemental/ordinals.xml',
+    'supplemental/plurals.xml',
+)
+
+#: Supplemental files read for every locale, in addition to its own XML file
+LOCALE_INPUTS = (
+    'supplemental/dayPeriods.xml',
+    'supplemental/ordinals.xml',
+    'supplemental/plurals.xml',
+    'supplemental/supplementalData.xml',
+)
 
 
 parse = ElementTree.parse
+iterparse = ElementTree.iterparse
 weekdays = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5,
             'sun': 6}
 
+#: The week data elements: tag, field of the week data and value converter
+WEEK_DATA_ELEMENTS = (
+    ('minDays', 'min_days', lambda elem: int(elem.attrib['count'])),
+    ('firstDay', 'first_day', lambda elem: weekdays[elem.attrib['day']]),
+    ('weekendStart', 'weekend_start', lambda elem: weekdays[elem.attrib['day']]),
+    ('weekendEnd', 'weekend_end', lambda elem: weekdays[elem.attrib['day']]),
+)
+
 
 def _text(elem):
     buf = [elem.text or '']
@@ -52,6 +127,52 @@ def _text(elem):
     return u''.join(filter(None, buf)).strip()
 
 
+def iter_sections(filename, paths):
+    """
+    Parse an XML file in a single streaming pass, yielding its sections.
+
+    Each element whose path below the document element (e.g.
+    ``'dates/calendars/calendar'``) is one of `paths` is yielded once it has
+    been parsed completely, and cleared as soon as the consumer resumes.
+    Everything outside those sections is dropped as soon as it is complete,
+    so at most one section is held in memory at a time.
+
+    :param filename: XML file name
+    :param paths: collection of section paths
+    :return: iterator of ``(path, section element, document element)`` tuples;
+             the document element contains nothing but the current section,
+             so descendant searches on it only scan that section
+    """
+    containers = set()
+    for path in paths:
+        parts = path.split('/')
+        for idx in range(1, len(parts)):
+            containers.add('/'.join(parts[:idx]))
+
+    root = None
+    stack = []
+    in_section = 0
+    for event, elem in iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+                continue
+            path = stack and '%s/%s' % (stack[-1], elem.tag) or elem.tag
+            stack.append(path)
+            if path in paths:
+                in_section += 1
+            continue
+        if elem is root:
+            break
+        path = stack.pop()
+        if path in paths:
+            yield path, elem, root
+            in_section -= 1
+            elem.clear()
+        elif not in_section and path not in containers:
+            elem.clear()
+
+
 NAME_RE = re.compile(r"^\w+$")
 TYPE_ATTR_RE = re.compile(r"^\w+\[@type='(.*?)'\]$")
 
@@ -76,21 +197,6 @@ def error(message, *args):
     log('ERROR: %s' % message, *args)
 
 
-def need_conversion(dst_filename, data_dict, source_filename):
-    with open(source_filename, 'rb') as f:
-        blob = f.read(4096)
-        version = int(re.search(b'version number="\\$Revision: (\\d+)',
-                                blob).group(1))
-
-    data_dict['_version'] = version
-    if not os.path.isfile(dst_filename):
-        return True
-
-    with open(dst_filename, 'rb') as f:
-        data = pickle.load(f)
-        return data.get('_version') != version
-
-
 def _translate_alias(ctxt, path):
     parts = path.split('/')
     keys = ctxt[:]
@@ -120,16 +226,58 @@ def _currency_sort_key(tup):
 
 
 def _extract_plural_rules(file_path):
+    """Return a dict mapping every locale to its `PluralRule`.
+
+    Rule sets that are equivalent after canonicalization share one
+    `PluralRule` object, even if they are spelled differently.
+    """
     rule_dict = {}
+    classes = {}
+    for locales, pr in iter_plural_rules(file_path):
+        pr = classes.setdefault(canonical_form(pr), pr)
+        for locale in locales:
+            rule_dict[locale] = pr
+    return rule_dict
+
+
+def iter_plural_rules(file_path):
+    """Yield the list of locales and the `PluralRule`, with its samples, of
+    every rule set of a CLDR plural rules file, in file order."""
     prsup = parse(file_path)
     for elem in prsup.findall('.//plurals/pluralRules'):
         rules = []
         for rule in elem.findall('pluralRule'):
             rules.append((rule.attrib['count'], text_type(rule.text)))
-        pr = PluralRule(rules)
-        for locale in elem.attrib['locales'].split():
-            rule_dict[locale] = pr
-    return rule_dict
+        yield elem.attrib['locales'].split(), PluralRule(rules)
+
+
+def _parse_territory_groups(sup):
+    """Return the direct members of every territory containment group.  A
+    group listed more than once (such as an additional grouping) contains
+    the members of all of its entries."""
+    groups = {}
+    for elem in sup.findall('.//territoryContainment/group'):
+        groups.setdefault(elem.attrib['type'], []).extend(elem.attrib['contains'].split())
+    return groups
+
+
+def _parse_week_data(sup):
+    """Return the week data entries as ``(field, territories, value)``
+    tuples, in document order."""
+    entries = []
+    for tag, field, convert in WEEK_DATA_ELEMENTS:
+        for elem in sup.findall('.//weekData/' + tag):
+            entries.append((field, elem.attrib['territories'].split(), convert(elem)))
+    return entries
+
+
+def _parse_parent_exceptions(sup):
+    parent_exceptions = {}
+    for paternity in sup.findall('.//parentLocales/parentLocale'):
+        parent = paternity.attrib['parent']
+        for child in paternity.attrib['locales'].split():
+            parent_exceptions[child] = parent
+    return parent_exceptions
 
 
 def _time_to_seconds_past_midnight(time_expr):
@@ -163,7 +311,48 @@ def debug_repr(obj):
     return repr(obj)
 
 
+def binary_repr(obj):
+    """
+    Encode the non-builtin values of the locale data for the binary format.
+
+    Plural rules become their abstract syntax tree as a list of
+    ``[tag, ast]`` pairs, with every AST node a ``[op, args]`` pair; number
+    and date/time patterns become maps of their parsed fields (including
+    the program of a date/time pattern, see `cldr_dates.compile_pattern`)
+    and aliases become ``{"alias": keys}`` maps.
+    """
+    if isinstance(obj, PluralRule):
+        return obj.abstract
+    if isinstance(obj, cldr_numbers.NumberPattern):
+        return {
+            'pattern': obj.pattern,
+            'prefix': obj.prefix,
+            'suffix': obj.suffix,
+            'grouping': obj.grouping,
+            'int_prec': obj.int_prec,
+            'frac_prec': obj.frac_prec,
+            'exp_prec': obj.exp_prec,
+            'exp_plus': obj.exp_plus,
+            'scale': obj.scale,
+        }
+    if isinstance(obj, cldr_dates.DateTimePattern):
+        return {'pattern': obj.pattern, 'format': obj.format, 'program': obj.program}
+    if isinstance(obj, Alias):
+        return {'alias': obj.keys}
+    raise TypeError('can not serialize %r' % (obj,))
+
+
+def datafile_exists(path, dump_json=False):
+    if dump_json and not os.path.isfile(path + '.json'):
+        return False
+    return os.path.isfile(path + '.msgpack')
+
+
 def write_datafile(path, data, dump_json=False):
+    payload = {'_schema': DATA_SCHEMA_VERSION}
+    payload.update(data)
+    with open(path + '.msgpack', 'wb') as outfile:
+        outfile.write(packb(payload, default=binary_repr))
     if dump_json:
         import json
         with open(path + '.json', 'w') as outfile:
@@ -180,29 +369,242 @@ def main():
         '-j', '--json', dest='dump_json', action='store_true', default=False,
         help='also export debugging JSON dumps of locale data'
     )
+    parser.add_option(
+        '--flatten', dest='flatten', action='store_true', default=False,
+        help='write locale data with inherited data merged in and aliases resolved'
+    )
+    parser.add_option(
+        '--jobs', dest='jobs', type='int', default=1, metavar='N',
+        help='import locales using N worker processes (0 = one per CPU)'
+    )
+    parser.add_option(
+        '--locales', dest='locales', metavar='LIST',
+        help='import only these comma-separated locales and their parents; '
+             'the data files of other locales are removed'
+    )
+    parser.add_option(
+        '--categories', dest='categories', metavar='LIST',
+        help='import only these comma-separated data categories (%s)'
+             % ', '.join(sorted(LOCALE_CATEGORIES))
+    )
+    parser.add_option(
+        '--profile', dest='profile', metavar='FILE',
+        help='record the time and memory used by every import stage and '
+             'locale, and write the report to FILE as JSON'
+    )
 
     options, args = parser.parse_args()
     if len(args) != 1:
         parser.error('incorrect number of arguments')
+    locales = categories = None
+    if options.locales:
+        locales = [name.strip() for name in options.locales.split(',') if name.strip()]
+    if options.categories:
+        categories = [name.strip() for name in options.categories.split(',') if name.strip()]
+        unknown = [name for name in categories if name not in LOCALE_CATEGORIES]
+        if unknown:
+            parser.error('unknown data categories: %s' % ', '.join(unknown))
     return process_data(
         srcdir=args[0],
         destdir=CLDR_ROOT,
         force=bool(options.force),
-        dump_json=bool(options.dump_json)
+        dump_json=bool(options.dump_json),
+        flatten=bool(options.flatten),
+        jobs=options.jobs,
+        locales=locales,
+        categories=categories,
+        profile=options.profile
     )
 
 
-def process_data(srcdir, destdir, force=False, dump_json=False):
+def process_data(srcdir, destdir, force=False, dump_json=False, flatten=False, jobs=1,
+                 locales=None, categories=None, profile=None):
+    """
+    Import the CLDR data in `srcdir` into `destdir`.
+
+    :param locales: if given, import only these locales and the locales they
+                    inherit from
+    :param categories: if given, import only these data categories of the
+                       locales (see `LOCALE_CATEGORIES`)
+    :param profile: if given, profile the import and write the report to
+                    this path as JSON (see `profiling`)
+    """
+    if profile:
+        profiling.start()
+        try:
+            _process_data(srcdir, destdir, force, dump_json, flatten, jobs,
+                          locales, categories)
+        finally:
+            report = profiling.stop().report()
+        for line in format_report(report).splitlines():
+            log(line)
+        write_report(profile, report)
+    else:
+        _process_data(srcdir, destdir, force, dump_json, flatten, jobs,
+                      locales, categories)
+
+
+def _process_data(srcdir, destdir, force, dump_json, flatten, jobs, locales, categories):
+    options = {'flatten': flatten}
+    if locales is not None:
+        options['locales'] = sorted(set(locales))
+    if categories is not None:
+        options['categories'] = sorted(set(categories))
+    manifest_path = os.path.join(destdir, 'manifest.json')
+    manifest = Manifest(srcdir, [os.path.join(SCRIPTS_DIR, filename)
+                                 for filename in IMPORTER_FILES],
+                        options=options)
+    if not force:
+        manifest.load(manifest_path)
+
     sup_filename = os.path.join(srcdir, 'supplemental', 'supplementalData.xml')
-    sup = parse(sup_filename)
+    with stage('parse_supplemental'):
+        sup = parse(sup_filename)
 
     # Import global data from the supplemental files
     global_path = os.path.join(destdir, 'global')
-    global_data = {}
-    if force or need_conversion(global_path, global_data, sup_filename):
-        global_data.update(parse_global(srcdir, sup))
-        write_datafile(global_path, global_data, dump_json=dump_json)
-    _process_local_datas(sup, srcdir, destdir, force=force, dump_json=dump_json)
+    changed = False
+    if not (manifest.is_current('global', GLOBAL_INPUTS) and
+            datafile_exists(global_path, dump_json=dump_json)):
+        global_data = {'_version': manifest.cldr_revision}
+        with stage('parse_global'):
+            global_data.update(parse_global(srcdir, sup))
+        with stage('serialize'):
+            write_datafile(global_path, global_data, dump_json=dump_json)
+        changed = True
+    manifest.record('global', GLOBAL_INPUTS)
+
+    # Compile the plural rules to Rust
+    plural_source_path = os.path.join(destdir, PLURAL_SOURCE_FILENAME)
+    if not (manifest.is_current(PLURAL_SOURCE_FILENAME, PLURAL_INPUTS) and
+            os.path.isfile(plural_source_path)):
+        with stage('write_plural_source'):
+            write_plural_source(plural_source_path, srcdir, manifest.cldr_revision)
+    manifest.record(PLURAL_SOURCE_FILENAME, PLURAL_INPUTS)
+
+    if _process_local_datas(sup, srcdir, destdir, manifest, dump_json=dump_json,
+                            flatten=flatten, jobs=jobs, locales=locales,
+                            categories=categories):
+        changed = True
+    # Data files of locales left out of this import would still be loaded
+    if _remove_stale_datafiles(destdir, manifest.outputs):
+        changed = True
+
+    bundle_path = os.path.join(destdir, BUNDLE_FILENAME)
+    if (changed or not os.path.isfile(bundle_path) or
+            set(manifest.outputs) != set(manifest.previous.get('outputs', ()))):
+        with stage('write_bundle'):
+            _write_bundle(destdir, bundle_path, [name for name in manifest.outputs
+                                                 if name != PLURAL_SOURCE_FILENAME])
+    manifest.save(manifest_path)
+
+
+def _remove_stale_datafiles(destdir, outputs):
+    """
+    Remove the locale data files that are not among the `outputs` of this
+    import, e.g. those of locales imported before with other ``--locales``.
+
+    :return: the names of the removed files
+    """
+    datadir = os.path.join(destdir, 'locale-data')
+    removed = []
+    for filename in sorted(os.listdir(datadir)):
+        stem, ext = os.path.splitext(filename)
+        if ext in ('.msgpack', '.json') and stem not in outputs:
+            log('Removing stale %s', filename)
+            os.remove(os.path.join(datadir, filename))
+            removed.append(filename)
+    return removed
+
+
+def _write_bundle(destdir, bundle_path, outputs):
+    entries = {}
+    for name in outputs:
+        if name == GLOBAL_ENTRY:
+            filename = os.path.join(destdir, 'global.msgpack')
+        else:
+            filename = os.path.join(destdir, 'locale-data', name + '.msgpack')
+        with open(filename, 'rb') as f:
+            entries[name] = unpackb(f.read())
+    entries, strings, shared, stats = deduplicate(entries)
+    for line in format_stats(stats).splitlines():
+        log(line)
+    write_bundle(bundle_path, entries, DATA_SCHEMA_VERSION, strings, shared)
+
+
+def write_plural_source(path, srcdir, revision):
+    """Write the Rust source of the cardinal and ordinal plural rules.
+
+    Every class of equivalent rule sets becomes one function, listed in the
+    ``CARDINAL_RULES`` and ``ORDINAL_RULES`` tables; ``cardinal_class`` and
+    ``ordinal_class`` map a locale to its index in the table, and
+    ``cardinal_rule`` and ``ordinal_rule`` to the function itself.  The
+    ``CARDINAL_SAMPLES`` and ``ORDINAL_SAMPLES`` test vectors hold the
+    samples of the first rule set of every class.
+    """
+    result = [
+        '// Generated by scripts/import_cldr.py from CLDR revision %d; '
+        'do not edit.' % revision,
+    ]
+    for kind, filename in (('cardinal', 'plurals.xml'), ('ordinal', 'ordinals.xml')):
+        rules = _extract_plural_rules(os.path.join(srcdir, 'supplemental', filename))
+        classes = {}
+        locales = []
+        samples = []
+        for locale, rule in sorted(rules.items()):
+            if id(rule) not in classes:
+                classes[id(rule)] = len(classes)
+                locales.append([])
+                result.append('')
+                result.append(to_rust(rule, '%s_%d' % (kind, classes[id(rule)])))
+                samples.extend((classes[id(rule)], value, tag)
+                               for value, tag in sample_vectors(rule))
+            locales[classes[id(rule)]].append(locale)
+        log('%d %s plural rule classes for %d locales', len(classes), kind, len(rules))
+        table = kind.upper() + '_RULES'
+        result.extend([
+            '',
+            'pub static %s: [fn(&PluralOperands) -> PluralCategory; %d] = [' % (
+                table, len(classes)),
+        ])
+        for idx in range(len(classes)):
+            result.append('    %s_%d,' % (kind, idx))
+        result.extend([
+            '];',
+            '',
+            '/// The CLDR samples of the rules in `%s`, as the rule index, the' % table,
+            '/// number and its expected category.',
+            '#[cfg(test)]',
+            'pub static %s_SAMPLES: [(usize, &str, PluralCategory); %d] = [' % (
+                kind.upper(), len(samples)),
+        ])
+        for idx, value, tag in samples:
+            result.append('    (%d, "%s", PluralCategory::%s),' % (idx, value, tag.capitalize()))
+        result.extend([
+            '];',
+            '',
+            '/// Return the index of the %s plural rule of `locale` in `%s`,' % (
+                kind, table),
+            '/// if CLDR defines one.',
+            'pub fn %s_class(locale: &str) -> Option<usize> {' % kind,
+            '    match locale {',
+        ])
+        for idx, names in enumerate(locales):
+            result.append('        %s => Some(%d),' % (
+                ' | '.join('"%s"' % name for name in names), idx))
+        result.extend([
+            '        _ => None,',
+            '    }',
+            '}',
+            '',
+            '/// Return the %s plural rule of `locale`, if CLDR defines one.' % kind,
+            'pub fn %s_rule(locale: &str) -> '
+            'Option<fn(&PluralOperands) -> PluralCategory> {' % kind,
+            '    %s_class(locale).map(|idx| %s[idx])' % (kind, table),
+            '}',
+        ])
+    with open(path, 'w') as f:
+        f.write('\n'.join(result) + '\n')
 
 
 def parse_global(srcdir, sup):
@@ -230,9 +632,12 @@ def parse_global(srcdir, sup):
     # aliases listed and we defer the decision of which ones to choose to the
     # 'bcp47' data
     _zone_territory_map = {}
+    _windows_zones = {}
     for map_zone in sup_windows_zones.findall('.//windowsZones/mapTimezones/mapZone'):
         if map_zone.attrib.get('territory') == '001':
             win_mapping[map_zone.attrib['other']] = map_zone.attrib['type'].split()[0]
+        _windows_zones.setdefault(map_zone.attrib['other'], {})[map_zone.attrib['territory']] = \
+            text_type(map_zone.attrib['type']).split()
         for tzid in text_type(map_zone.attrib['type']).split():
             _zone_territory_map[tzid] = text_type(map_zone.attrib['territory'])
     for key_elem in bcp47_timezone.findall('.//keyword/key'):
@@ -250,12 +655,19 @@ def parse_global(srcdir, sup):
 
     # Import Metazone mapping
     meta_zones = global_data.setdefault('meta_zones', {})
+    meta_zone_periods = {}
     tzsup = parse(os.path.join(srcdir, 'supplemental', 'metaZones.xml'))
     for elem in tzsup.findall('.//timezone'):
         for child in elem.findall('usesMetazone'):
-            if 'to' not in child.attrib:  # FIXME: support old mappings
+            meta_zone_periods.setdefault(elem.attrib['type'], []).append(
+                (child.attrib.get('from'), child.attrib.get('to'), child.attrib['mzone']))
+            if 'to' not in child.attrib:
                 meta_zones[elem.attrib['type']] = child.attrib['mzone']
 
+    # Zone index, with the metazones of every zone over time
+    global_data['zone_index'] = zone_index(zone_territories, zone_aliases,
+                                           meta_zone_periods, _windows_zones)
+
     # Language aliases
     for alias in sup_metadata.findall('.//alias/languageAlias'):
         # We don't have a use for those at the moment.  They don't
@@ -281,6 +693,7 @@ def parse_global(srcdir, sup):
     # Likely subtags
     for likely_subtag in sup_likely.findall('.//likelySubtags/likelySubtag'):
         likely_subtags[likely_subtag.attrib['from']] = likely_subtag.attrib['to']
+    global_data['likely_minimal'] = minimal_table(likely_subtags)
 
     # Currencies in territories
     for region in sup.findall('.//currencyData/region'):
@@ -295,12 +708,10 @@ def parse_global(srcdir, sup):
                                           'tender', 'true') == 'true'))
         region_currencies.sort(key=_currency_sort_key)
         territory_currencies[region_code] = region_currencies
+    global_data['currency_index'] = currency_index(territory_currencies)
 
     # Explicit parent locales
-    for paternity in sup.findall('.//parentLocales/parentLocale'):
-        parent = paternity.attrib['parent']
-        for child in paternity.attrib['locales'].split():
-            parent_exceptions[child] = parent
+    parent_exceptions.update(_parse_parent_exceptions(sup))
 
     # Currency decimal and rounding digits
     for fraction in sup.findall('.//currencyData/fractions/info'):
@@ -311,6 +722,14 @@ def parse_global(srcdir, sup):
         cur_crounding = int(fraction.attrib.get('cashRounding', cur_rounding))
         currency_fractions[cur_code] = (cur_digits, cur_rounding, cur_cdigits, cur_crounding)
 
+    # Territory containment, as bitsets of all containers of each territory
+    containment = containment_index(_parse_territory_groups(sup))
+    global_data['territory_containment'] = containment
+
+    # Week data, resolved for every territory
+    global_data['territory_week_data'] = resolve_week_data(
+        _parse_week_data(sup), Containment(containment))
+
     # Languages in territories
     for territory in sup.findall('.//territoryInfo/territory'):
         languages = {}
@@ -323,106 +742,345 @@ def parse_global(srcdir, sup):
     return global_data
 
 
-def _process_local_datas(sup, srcdir, destdir, force=False, dump_json=False):
-    day_period_rules = parse_day_period_rules(parse(os.path.join(srcdir, 'supplemental', 'dayPeriods.xml')))
-    # build a territory containment mapping for inheritance
-    regions = {}
-    for elem in sup.findall('.//territoryContainment/group'):
-        regions[elem.attrib['type']] = elem.attrib['contains'].split()
-
-    # Resolve territory containment
-    territory_containment = {}
-    region_items = sorted(regions.items())
-    for group, territory_list in region_items:
-        for territory in territory_list:
-            containers = territory_containment.setdefault(territory, set([]))
-            if group in territory_containment:
-                containers |= territory_containment[group]
-            containers.add(group)
+def _load_locale_support(srcdir, categories=None):
+    """
+    Parse the supplemental data shared by every locale import.
+
+    :param srcdir: CLDR `common` directory
+    :param categories: the imported data categories, or `None` for all
+    :return: dict of the supplemental data used by `_process_local_data`
+    """
+    if categories is None:
+        categories = LOCALE_CATEGORIES
+    day_period_rules = {}
+    if 'dates' in categories:
+        day_period_rules = parse_day_period_rules(
+            parse(os.path.join(srcdir, 'supplemental', 'dayPeriods.xml')))
 
     # prepare the per-locale plural rules definitions
-    plural_rules = _extract_plural_rules(os.path.join(srcdir, 'supplemental', 'plurals.xml'))
-    ordinal_rules = _extract_plural_rules(os.path.join(srcdir, 'supplemental', 'ordinals.xml'))
+    plural_rules = ordinal_rules = {}
+    if 'plurals' in categories:
+        plural_rules = _extract_plural_rules(os.path.join(srcdir, 'supplemental', 'plurals.xml'))
+        ordinal_rules = _extract_plural_rules(os.path.join(srcdir, 'supplemental', 'ordinals.xml'))
+
+    # only the sections that some imported category is parsed from are read
+    parsers = set()
+    for category in categories:
+        parsers.update(LOCALE_CATEGORIES[category])
+    sections = {}
+    for path, section_parsers in LOCALE_SECTIONS.items():
+        section_parsers = tuple(parser for parser in section_parsers if parser in parsers)
+        if section_parsers or path == 'identity':
+            sections[path] = section_parsers
+
+    # the supplemental data of every locale, by locale id
+    locale_rules = {}
+    for key, rules in (('plural_form', plural_rules), ('ordinal_form', ordinal_rules),
+                       ('day_period_rules', day_period_rules)):
+        for locale_id, value in rules.items():
+            locale_rules.setdefault(locale_id, {})[key] = value
+
+    return {
+        'locale_rules': locale_rules,
+        'parsers': tuple(parser for parser in LOCALE_PARSERS if parser in parsers),
+        'sections': sections,
+    }
+
+
+class _SharedLocaleRules(object):
+    """
+    The per-locale supplemental data of `_load_locale_support`, read from a
+    memory-mapped bundle file instead of being copied into every import
+    worker: the page cache holds one copy of the file for all workers, and
+    each worker only decodes the entries of the locales it imports.
+    Pickles as the file name, and maps the file again when unpickled.
 
-    filenames = os.listdir(os.path.join(srcdir, 'main'))
-    filenames.remove('root.xml')
-    filenames.sort(key=len)
-    filenames.insert(0, 'root.xml')
+    :param path: the bundle file written by `create`
+    """
 
-    for filename in filenames:
-        stem, ext = os.path.splitext(filename)
-        if ext != '.xml':
-            continue
+    def __init__(self, path):
+        self.path = path
+        self._bundle = Bundle(path)
+
+    @classmethod
+    def create(cls, path, locale_rules):
+        """Write the `locale_rules` of `_load_locale_support` to the bundle
+        file `path`, and map it."""
+        entries = dict((locale_id, unpackb(packb(rules, default=binary_repr)))
+                       for locale_id, rules in locale_rules.items())
+        entries, strings, shared, _ = deduplicate(entries)
+        write_bundle(path, entries, DATA_SCHEMA_VERSION, strings, shared)
+        return cls(path)
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+    def close(self):
+        self._bundle.close()
+
+    def get(self, locale_id, default=None):
+        """Return the supplemental data of `locale_id`, with its plural rules
+        as `PluralRule` objects."""
+        try:
+            rules = dict(self._bundle.load(locale_id))
+        except KeyError:
+            return default
+        for key in ('plural_form', 'ordinal_form'):
+            if key in rules:
+                rule = PluralRule(())
+                rule.abstract = [(tag, ast) for tag, ast in rules[key]]
+                rules[key] = rule
+        return rules
+
+
+def _select_locales(filenames, locales, parent_exceptions):
+    """
+    Return the locale files of `locales` and of the locales they inherit
+    from, in the order of `filenames`.
 
-        full_filename = os.path.join(srcdir, 'main', filename)
-        data_filename = os.path.join(destdir, 'locale-data', stem)
+    :param filenames: the file names of all locales in `common/main`
+    :param locales: the locale identifiers to import
+    :param parent_exceptions: the explicit parent locales
+    """
+    stems = set(os.path.splitext(filename)[0] for filename in filenames)
+    selected = set(['root'])
+    for name in locales:
+        while name is not None and name not in selected:
+            if name not in stems:
+                raise ValueError('no locale data for %s' % name)
+            selected.add(name)
+            name = parent_locale(name, parent_exceptions)
+    return [filename for filename in filenames
+            if os.path.splitext(filename)[0] in selected]
+
+
+def _locale_inputs(filename, parents=None):
+    """
+    Return the source files the data of a locale is built from.
 
-        data = {}
-        if not (force or need_conversion(data_filename, data, full_filename)):
-            continue
+    :param filename: file name of the locale in `common/main`
+    :param parents: when flattening, the parent locale of every locale;
+                    the files of the whole parent chain are then inputs too
+    """
+    stem = os.path.splitext(filename)[0]
+    chain = [stem]
+    while parents and parents[chain[-1]]:
+        chain.append(parents[chain[-1]])
+    return LOCALE_INPUTS + tuple('main/%s.xml' % name for name in chain)
 
-        tree = parse(full_filename)
 
-        language = None
-        elem = tree.find('.//identity/language')
-        if elem is not None:
-            language = elem.attrib['type']
+def _process_local_datas(sup, srcdir, destdir, manifest, dump_json=False,
+                         flatten=False, jobs=1, locales=None, categories=None):
+    """
+    Import the locale files whose inputs changed since the last run.
 
-        territory = None
-        elem = tree.find('.//identity/territory')
-        if elem is not None:
-            territory = elem.attrib['type']
+    :param locales: if given, only import these locales and their parents
+    :param categories: if given, only import these data categories
+    :return: the file names of the imported locales
+    """
+    filenames = os.listdir(os.path.join(srcdir, 'main'))
+    filenames.remove('root.xml')
+    filenames.sort(key=len)
+    filenames.insert(0, 'root.xml')
+    filenames = [filename for filename in filenames
+                 if os.path.splitext(filename)[1] == '.xml']
+    if locales is not None:
+        filenames = _select_locales(filenames, locales, _parse_parent_exceptions(sup))
+
+    parents = None
+    if flatten:
+        parent_exceptions = _parse_parent_exceptions(sup)
+        stems = set(os.path.splitext(filename)[0] for filename in filenames)
+        parents = {}
+        for stem in stems:
+            parents[stem] = parent_locale(stem, parent_exceptions)
+            if parents[stem] is not None and parents[stem] not in stems:
+                raise ValueError('no locale data for %s, the parent locale of %s'
+                                 % (parents[stem], stem))
+
+    stale = []
+    for filename in filenames:
+        stem = os.path.splitext(filename)[0]
+        inputs = _locale_inputs(filename, parents)
+        data_filename = os.path.join(destdir, 'locale-data', stem)
+        if (manifest.is_current(stem, inputs) and
+                datafile_exists(data_filename, dump_json=dump_json)):
+            manifest.record(stem, inputs)
         else:
-            territory = '001'  # world
-        regions = territory_containment.get(territory, [])
-
-        log('Processing %s (Language = %s; Territory = %s)',
-            filename, language, territory)
-
-        locale_id = '_'.join(filter(None, [
-            language,
-            territory != '001' and territory or None
-        ]))
+            stale.append(filename)
+    if not stale:
+        return stale
+
+    with stage('load_locale_support'):
+        support = _load_locale_support(srcdir, categories)
+
+    if not flatten:
+        for filename, data in _import_locales(support, srcdir, destdir, stale,
+                                              dump_json=dump_json, jobs=jobs):
+            manifest.record(os.path.splitext(filename)[0], _locale_inputs(filename))
+        return stale
+
+    # Flattening a locale needs the data of its whole parent chain, so the
+    # unchanged ancestors of the stale locales are parsed (but not written)
+    # as well.
+    needed = set()
+    for filename in stale:
+        needed.update(_locale_inputs(filename, parents)[len(LOCALE_INPUTS):])
+    needed = [filename for filename in filenames if 'main/' + filename in needed]
+    own_data = {}
+    for filename, data in _import_locales(support, srcdir, destdir, needed,
+                                          dump_json=dump_json, flatten=True,
+                                          jobs=jobs):
+        own_data[os.path.splitext(filename)[0]] = data
+
+    merged = {}
+    for filename in sorted(needed, key=lambda name: len(_locale_inputs(name, parents))):
+        stem = os.path.splitext(filename)[0]
+        data = {}
+        if parents[stem] is not None:
+            data = merged[parents[stem]].copy()
+        with stage('flatten', stem):
+            merge(data, own_data.pop(stem))
+        merged[stem] = data
+        if filename in stale:
+            with stage('flatten', stem):
+                data = resolve_aliases(data)
+            with stage('serialize', stem):
+                write_datafile(os.path.join(destdir, 'locale-data', stem),
+                               data, dump_json=dump_json)
+            manifest.record(stem, _locale_inputs(filename, parents))
+    return stale
+
+
+def _import_locales(support, srcdir, destdir, filenames, dump_json=False,
+                    flatten=False, jobs=1):
+    """
+    Import the given locale files, in parallel if `jobs` is not 1.
 
-        if locale_id in plural_rules:
-            data['plural_form'] = plural_rules[locale_id]
-        if locale_id in ordinal_rules:
-            data['ordinal_form'] = ordinal_rules[locale_id]
-        if locale_id in day_period_rules:
-            data["day_period_rules"] = day_period_rules[locale_id]
+    :return: iterator of ``(filename, data)`` tuples in completion order;
+             the data is only passed back when flattening, otherwise it is
+             written straight away and `None` is returned instead
+    """
+    args = (support, srcdir, destdir, dump_json, flatten)
+    if jobs == 1:
+        for filename in filenames:
+            yield _import_locale(filename, *args)
+        return
 
-        parse_locale_display_names(data, tree)
+    # The workers read the supplemental data of the locales from a shared
+    # memory-mapped file rather than each getting a copy of it
+    import multiprocessing
+    import shutil
+    import tempfile
+    tmpdir = tempfile.mkdtemp(prefix='import_cldr-')
+    locale_rules = _SharedLocaleRules.create(os.path.join(tmpdir, 'support.bundle'),
+                                             support['locale_rules'])
+    args = (dict(support, locale_rules=locale_rules),) + args[1:]
+    profiler = profiling.active()
+    trace_memory = profiler.trace_memory if profiler else None
+    pool = multiprocessing.Pool(jobs or None, _init_locale_worker,
+                                (trace_memory,) + args)
+    try:
+        for result, records in pool.imap_unordered(_import_locale_worker, filenames):
+            if records:
+                profiler.merge(records)
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+        locale_rules.close()
+        shutil.rmtree(tmpdir)
+
+
+_worker_args = None
+
+
+def _init_locale_worker(trace_memory, *args):
+    global _worker_args
+    _worker_args = args
+    # a forked worker inherits the profiler of the main process, records and
+    # all; it gets a fresh one whose records are sent back with the results
+    profiling.stop()
+    if trace_memory is not None:
+        profiling.start(trace_memory)
+
+
+def _import_locale_worker(filename):
+    result = _import_locale(filename, *_worker_args)
+    profiler = profiling.active()
+    return result, profiler.drain() if profiler else None
+
+
+def _import_locale(filename, support, srcdir, destdir, dump_json=False, flatten=False):
+    stem = os.path.splitext(filename)[0]
+    with stage('read_xml', stem):
+        data = _process_local_data(support, srcdir, filename)
+    if flatten:
+        return filename, data
+    data_filename = os.path.join(destdir, 'locale-data', stem)
+    with stage('serialize', stem):
+        write_datafile(data_filename, data, dump_json=dump_json)
+    return filename, None
 
-        parse_dates(data, tree, sup, regions, territory)
 
-        for calendar in tree.findall('.//calendars/calendar'):
-            if calendar.attrib['type'] != 'gregorian':
+def _process_local_data(support, srcdir, filename):
+    """
+    Parse the locale file `filename` into a dict of its own locale data.
+    """
+    parsers = support['parsers']
+    sections = support['sections']
+
+    full_filename = os.path.join(srcdir, 'main', filename)
+    stem = os.path.splitext(filename)[0]
+
+    language = None
+    territory = '001'  # world
+    results = {}
+    for path, elem, root in iter_sections(full_filename, sections):
+        if path == 'identity':
+            for child in elem:
+                if child.tag == 'language':
+                    language = child.attrib['type']
+                elif child.tag == 'territory':
+                    territory = child.attrib['type']
+            log('Processing %s (Language = %s; Territory = %s)',
+                filename, language, territory)
+        elif path == 'dates/calendars/calendar':
+            if elem.attrib['type'] != 'gregorian':
                 # TODO: support other calendar types
                 continue
-
-            parse_calendar_months(data, calendar)
-            parse_calendar_days(data, calendar)
-            parse_calendar_quarters(data, calendar)
-            parse_calendar_eras(data, calendar)
-            parse_calendar_periods(data, calendar)
-            parse_calendar_date_formats(data, calendar)
-            parse_calendar_time_formats(data, calendar)
-            parse_calendar_datetime_skeletons(data, calendar)
-            parse_interval_formats(data, calendar)
-
-        parse_number_symbols(data, tree)
-        parse_decimal_formats(data, tree)
-        parse_scientific_formats(data, tree)
-        parse_percent_formats(data, tree)
-
-        parse_currency_formats(data, tree)
-        parse_currency_names(data, tree)
-        parse_unit_patterns(data, tree)
-        parse_date_fields(data, tree)
-        parse_character_order(data, tree)
-        parse_measurement_systems(data, tree)
-
-        write_datafile(data_filename, data, dump_json=dump_json)
+            for parser in sections[path]:
+                with stage(parser.__name__, stem):
+                    parser(results.setdefault(parser, {}), elem)
+        else:
+            for parser in sections[path]:
+                with stage(parser.__name__, stem):
+                    parser(results.setdefault(parser, {}), root)
+
+    # Parsers whose section is missing from the file still record their
+    # (empty) data, just like a search over the whole tree would.
+    for parser in parsers:
+        if parser not in results and parser not in CALENDAR_PARSERS:
+            with stage(parser.__name__, stem):
+                parser(results.setdefault(parser, {}), root)
+
+    locale_id = '_'.join(filter(None, [
+        language,
+        territory != '001' and territory or None
+    ]))
+
+    # The week data is resolved per territory in the global data
+    data = {'_version': read_revision(full_filename), 'territory': territory}
+    rules = support['locale_rules'].get(locale_id, {})
+    for key in ('plural_form', 'ordinal_form', 'day_period_rules'):
+        if key in rules:
+            data[key] = rules[key]
+    for parser in parsers:
+        data.update(results.get(parser, {}))
+    return data
 
 
 def _should_skip_elem(elem, type=None, dest=None):
@@ -473,6 +1131,9 @@ def parse_locale_display_names(data, tree):
     scripts = data.setdefault('scripts', {})
     for elem in tree.findall('.//scripts/script'):
         _import_type_text(scripts, elem)
+
+
+def parse_list_patterns(data, tree):
     list_patterns = data.setdefault('list_patterns', {})
     for listType in tree.findall('.//listPatterns/listPattern'):
         if 'type' in listType.attrib:
@@ -481,25 +1142,7 @@ def parse_locale_display_names(data, tree):
             list_patterns[listPattern.attrib['type']] = _text(listPattern)
 
 
-def parse_dates(data, tree, sup, regions, territory):
-    week_data = data.setdefault('week_data', {})
-    supelem = sup.find('.//weekData')
-    for elem in supelem.findall('minDays'):
-        territories = elem.attrib['territories'].split()
-        if territory in territories or any([r in territories for r in regions]):
-            week_data['min_days'] = int(elem.attrib['count'])
-    for elem in supelem.findall('firstDay'):
-        territories = elem.attrib['territories'].split()
-        if territory in territories or any([r in territories for r in regions]):
-            week_data['first_day'] = weekdays[elem.attrib['day']]
-    for elem in supelem.findall('weekendStart'):
-        territories = elem.attrib['territories'].split()
-        if territory in territories or any([r in territories for r in regions]):
-            week_data['weekend_start'] = weekdays[elem.attrib['day']]
-    for elem in supelem.findall('weekendEnd'):
-        territories = elem.attrib['territories'].split()
-        if territory in territories or any([r in territories for r in regions]):
-            week_data['weekend_end'] = weekdays[elem.attrib['day']]
+def parse_dates(data, tree):
     zone_formats = data.setdefault('zone_formats', {})
     for elem in tree.findall('.//timeZoneNames/gmtFormat'):
         if not _should_skip_elem(elem):
@@ -553,7 +1196,7 @@ def parse_calendar_months(data, calendar):
         for width in ctxt.findall('monthWidth'):
             width_type = width.attrib['type']
             widths = ctxts.setdefault(width_type, {})
-            for elem in width.getiterator():
+            for elem in width.iter():
                 if elem.tag == 'month':
                     _import_type_text(widths, elem, int(elem.attrib['type']))
                 elif elem.tag == 'alias':
@@ -571,7 +1214,7 @@ def parse_calendar_days(data, calendar):
         for width in ctxt.findall('dayWidth'):
             width_type = width.attrib['type']
             widths = ctxts.setdefault(width_type, {})
-            for elem in width.getiterator():
+            for elem in width.iter():
                 if elem.tag == 'day':
                     _import_type_text(widths, elem, weekdays[elem.attrib['type']])
                 elif elem.tag == 'alias':
@@ -589,7 +1232,7 @@ def parse_calendar_quarters(data, calendar):
         for width in ctxt.findall('quarterWidth'):
             width_type = width.attrib['type']
             widths = ctxts.setdefault(width_type, {})
-            for elem in width.getiterator():
+            for elem in width.iter():
                 if elem.tag == 'quarter':
                     _import_type_text(widths, elem, int(elem.attrib['type']))
                 elif elem.tag == 'alias':
@@ -604,7 +1247,7 @@ def parse_calendar_eras(data, calendar):
     for width in calendar.findall('eras/*'):
         width_type = NAME_MAP[width.tag]
         widths = eras.setdefault(width_type, {})
-        for elem in width.getiterator():
+        for elem in width.iter():
             if elem.tag == 'era':
                 _import_type_text(widths, elem, type=int(elem.attrib.get('type')))
             elif elem.tag == 'alias':
@@ -631,7 +1274,7 @@ def parse_calendar_periods(data, calendar):
 def parse_calendar_date_formats(data, calendar):
     date_formats = data.setdefault('date_formats', {})
     for format in calendar.findall('dateFormats'):
-        for elem in format.getiterator():
+        for elem in format.iter():
             if elem.tag == 'dateFormatLength':
                 type = elem.attrib.get('type')
                 if _should_skip_elem(elem, type, date_formats):
@@ -651,7 +1294,7 @@ def parse_calendar_date_formats(data, calendar):
 def parse_calendar_time_formats(data, calendar):
     time_formats = data.setdefault('time_formats', {})
     for format in calendar.findall('timeFormats'):
-        for elem in format.getiterator():
+        for elem in format.iter():
             if elem.tag == 'timeFormatLength':
                 type = elem.attrib.get('type')
                 if _should_skip_elem(elem, type, time_formats):
@@ -672,13 +1315,15 @@ def parse_calendar_datetime_skeletons(data, calendar):
     datetime_formats = data.setdefault('datetime_formats', {})
     datetime_skeletons = data.setdefault('datetime_skeletons', {})
     for format in calendar.findall('dateTimeFormats'):
-        for elem in format.getiterator():
+        for elem in format.iter():
             if elem.tag == 'dateTimeFormatLength':
                 type = elem.attrib.get('type')
                 if _should_skip_elem(elem, type, datetime_formats):
                     continue
                 try:
-                    datetime_formats[type] = text_type(elem.findtext('dateTimeFormat/pattern'))
+                    datetime_formats[type] = cldr_dates.parse_pattern(
+                        text_type(elem.findtext('dateTimeFormat/pattern'))
+                    )
                 except ValueError as e:
                     error(e)
             elif elem.tag == 'alias':
@@ -800,12 +1445,15 @@ def parse_interval_formats(data, tree):
         if 'draft' in elem.attrib:
             continue
         if elem.tag == "intervalFormatFallback":
-            interval_formats[None] = elem.text
+            interval_formats[None] = cldr_dates.parse_pattern(text_type(elem.text))
         elif elem.tag == "intervalFormatItem":
             skel_data = interval_formats.setdefault(elem.attrib["id"], {})
-            for item_sub in elem.getchildren():
+            for item_sub in list(elem):
                 if item_sub.tag == "greatestDifference":
-                    skel_data[item_sub.attrib["id"]] = split_interval_pattern(item_sub.text)
+                    skel_data[item_sub.attrib["id"]] = [
+                        cldr_dates.parse_pattern(pattern)
+                        for pattern in split_interval_pattern(text_type(item_sub.text))
+                    ]
                 else:
                     raise NotImplementedError("Not implemented: %s(%r)" % (item_sub.tag, item_sub.attrib))
 
@@ -822,7 +1470,7 @@ def parse_currency_formats(data, tree):
                 type = '%s:%s' % (type, curr_length_type)
             if _should_skip_elem(elem, type, currency_formats):
                 continue
-            for child in elem.getiterator():
+            for child in elem.iter():
                 if child.tag == 'alias':
                     currency_formats[type] = Alias(
                         _translate_alias(['currency_formats', elem.attrib['type']],
@@ -869,5 +1517,79 @@ def parse_measurement_systems(data, tree):
             _import_type_text(measurement_systems, measurement_system, type=type)
 
 
+#: Parsers for the gregorian `<calendar>` elements
+CALENDAR_PARSERS = (
+    parse_calendar_months,
+    parse_calendar_days,
+    parse_calendar_quarters,
+    parse_calendar_eras,
+    parse_calendar_periods,
+    parse_calendar_date_formats,
+    parse_calendar_time_formats,
+    parse_calendar_datetime_skeletons,
+    parse_interval_formats,
+)
+
+#: All locale data parsers, in the order their keys appear in the output
+LOCALE_PARSERS = (
+    parse_locale_display_names,
+    parse_list_patterns,
+    parse_dates,
+) + CALENDAR_PARSERS + (
+    parse_number_symbols,
+    parse_decimal_formats,
+    parse_scientific_formats,
+    parse_percent_formats,
+    parse_currency_formats,
+    parse_currency_names,
+    parse_unit_patterns,
+    parse_date_fields,
+    parse_character_order,
+    parse_measurement_systems,
+)
+
+#: The parsers to run over each locale file section, by path below `<ldml>`
+LOCALE_SECTIONS = {
+    'identity': (),
+    'localeDisplayNames': (parse_locale_display_names, parse_measurement_systems),
+    'layout': (parse_character_order,),
+    'dates/calendars/calendar': CALENDAR_PARSERS,
+    'dates': (parse_dates, parse_date_fields),
+    'numbers': (
+        parse_number_symbols,
+        parse_decimal_formats,
+        parse_scientific_formats,
+        parse_percent_formats,
+        parse_currency_formats,
+        parse_currency_names,
+    ),
+    'units': (parse_unit_patterns,),
+    'listPatterns': (parse_list_patterns,),
+}
+
+#: The data categories a locale import can be restricted to, with the parsers
+#: of their data; the plural and ordinal rules of the supplemental data are
+#: the ``plurals`` category, the day period rules are part of ``dates``
+LOCALE_CATEGORIES = {
+    'currencies': (parse_currency_names,),
+    'dates': tuple(parser for parser in CALENDAR_PARSERS
+                   if parser is not parse_interval_formats) + (parse_date_fields,),
+    'display_names': (parse_locale_display_names, parse_measurement_systems),
+    'intervals': (parse_interval_formats,),
+    'layout': (parse_character_order,),
+    'lists': (parse_list_patterns,),
+    'numbers': (
+        parse_number_symbols,
+        parse_decimal_formats,
+        parse_scientific_formats,
+        parse_percent_formats,
+        parse_currency_formats,
+    ),
+    'plurals': (),
+    'units': (parse_unit_patterns,),
+    'zones': (parse_dates,),
+}
+
+
 if __name__ == '__main__':
     main()
@@ -6,6 +6,209 @@
     :copyright: (c) 2013 by the Babel Team.
     :license: BSD, see LICENSE for more details.
 """
+import os
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+from packdata import unpackb
+from currencies import CurrencyIndex
+from territories import WEEK_DATA_FIELDS
+from zones import ZoneIndex
+
+_cache = {}
+_dirname = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'cldr')
+
+
+def get_global(key):
+    """Return the dictionary for the given key in the global data."""
+    if 'global' not in _cache:
+        with open(os.path.join(_dirname, 'global.msgpack'), 'rb') as fileobj:
+            _cache['global'] = unpackb(fileobj.read())
+    return _cache['global'].get(key, {})
+
+
+def get_week_data(data):
+    """Return the week data of a locale as a dict, from the week data of its
+    territory in the global data.
+
+    :param data: the locale data, as returned by `load`
+    """
+    territory_week_data = get_global('territory_week_data')
+    values = territory_week_data.get(data.get('territory', '001'))
+    if values is None:
+        values = territory_week_data.get('001', ())
+    return dict((field, value) for field, value in zip(WEEK_DATA_FIELDS, values)
+                if value is not None)
+
+
+def get_territory_currencies(territory, date=None, tender=True, non_tender=False):
+    """Return the codes of the currencies in use in `territory` on `date`
+    (today by default), in order of preference, from the currency index of
+    the global data.  See `currencies.CurrencyIndex.currencies`.
+    """
+    if 'currencies' not in _cache:
+        _cache['currencies'] = CurrencyIndex(get_global('currency_index'))
+    return _cache['currencies'].currencies(territory, date, tender=tender,
+                                           non_tender=non_tender)
+
+
+def get_zone_names(data, tzid, timestamp=None):
+    """Return the names of the time zone `tzid` in a locale as a dict: the
+    names of the metazone the zone uses at `timestamp`, overridden by the
+    names of the zone itself, with its canonical id (``zone``) and metazone
+    (``meta_zone``).  Returns ``None`` for an unknown zone.
+
+    :param data: the locale data, as returned by `load`
+    :param tzid: a zone id or alias
+    :param timestamp: seconds since the epoch (UTC), or ``None`` for the
+                      names the zone has today
+    """
+    if 'zones' not in _cache:
+        _cache['zones'] = ZoneIndex(get_global('zone_index'))
+    zones = _cache['zones']
+    canonical = zones.canonical(tzid)
+    if canonical is None:
+        return None
+    meta_zone = zones.meta_zone(canonical, timestamp)
+    result = {'zone': canonical, 'meta_zone': meta_zone}
+    for info in (data.get('meta_zones', {}).get(meta_zone),
+                 data.get('time_zones', {}).get(canonical)):
+        for key, value in (info or {}).items():
+            if isinstance(value, dict):
+                result.setdefault(key, {}).update(value)
+            else:
+                result[key] = value
+    return result
+
+
+def parent_locale(name, parent_exceptions):
+    """Return the name of the locale the data of locale `name` inherits from.
+
+    >>> parent_locale('en_GB', {'en_GB': 'en_001'})
+    'en_001'
+    >>> parent_locale('de_CH', {})
+    'de'
+    >>> parent_locale('de', {})
+    'root'
+    >>> parent_locale('root', {})
+
+    :param name: the locale identifier string
+    :param parent_exceptions: the explicit parent locales from the global data
+    """
+    if name == 'root':
+        return None
+    parent = parent_exceptions.get(name)
+    if not parent:
+        parts = name.split('_')
+        if len(parts) == 1:
+            parent = 'root'
+        else:
+            parent = '_'.join(parts[:-1])
+    return parent
+
+
+def load(name, merge_inherited=True):
+    """Load the locale data for the given locale.
+    The locale data is a dictionary that contains much of the data defined by
+    the Common Locale Data Repository (CLDR). This data is stored as a
+    collection of MessagePack files written by ``import_cldr.py``.
+    >>> d = load('en_US')               # doctest: +SKIP
+    >>> d['languages']['sv']            # doctest: +SKIP
+    u'Swedish'
+    Note that the results are cached, and subsequent requests for the same
+    locale return the same dictionary.
+    :param name: the locale identifier string (or "root")
+    :param merge_inherited: whether the inherited data should be merged into
+                            the data of the requested locale
+    :raise `IOError`: if no locale data file is found for the given locale
+                      identifier
+    """
+    key = (name, merge_inherited)
+    data = _cache.get(key)
+    if not data:
+        if name == 'root' or not merge_inherited:
+            data = {}
+        else:
+            parent = parent_locale(name, get_global('parent_exceptions'))
+            data = load(parent).copy()
+        filename = os.path.join(_dirname, 'locale-data', '%s.msgpack' % name)
+        with open(filename, 'rb') as fileobj:
+            merge(data, _decode_aliases(unpackb(fileobj.read())))
+        _cache[key] = data
+    return data
+
+
+def _decode_aliases(data):
+    """Turn the ``{"alias": keys}`` maps of the binary data back into `Alias`
+    objects."""
+    for key, value in data.items():
+        if type(value) is dict:
+            if len(value) == 1 and isinstance(value.get('alias'), list):
+                data[key] = Alias(value['alias'])
+            else:
+                _decode_aliases(value)
+    return data
+
+
+def merge(dict1, dict2):
+    """Merge the data from `dict2` into the `dict1` dictionary, making copies
+    of nested dictionaries.
+    >>> d = {1: 'foo', 3: 'baz'}
+    >>> merge(d, {1: 'Foo', 2: 'Bar'})
+    >>> sorted(d.items())
+    [(1, 'Foo'), (2, 'Bar'), (3, 'baz')]
+
+    :param dict1: the dictionary to merge into
+    :param dict2: the dictionary containing the data that should be merged
+    """
+    for key, val2 in dict2.items():
+        if val2 is not None:
+            val1 = dict1.get(key)
+            if isinstance(val2, dict):
+                if val1 is None:
+                    val1 = {}
+                if isinstance(val1, Alias):
+                    val1 = (val1, val2)
+                elif isinstance(val1, tuple):
+                    alias, others = val1
+                    others = others.copy()
+                    merge(others, val2)
+                    val1 = (alias, others)
+                else:
+                    val1 = val1.copy()
+                    merge(val1, val2)
+            else:
+                val1 = val2
+            dict1[key] = val1
+
+
+def resolve_aliases(data, base=None):
+    """Return a copy of the merged locale data `data` in which every alias
+    has been replaced by the data it refers to.
+    >>> resolve_aliases({'a': {1: 'x'}, 'b': Alias(['a'])})
+    {'a': {1: 'x'}, 'b': {1: 'x'}}
+
+    :param data: the locale data, with inherited data merged in
+    :param base: the top-level locale data the alias keys are relative to
+    """
+    if base is None:
+        base = data
+    result = {}
+    for key, val in data.items():
+        if isinstance(val, Alias):
+            val = val.resolve(base)
+        if isinstance(val, tuple) and val and isinstance(val[0], Alias):
+            alias, others = val
+            val = alias.resolve(base).copy()
+            merge(val, others)
+        if type(val) is dict:
+            val = resolve_aliases(val, base)
+        result[key] = val
+    return result
 
 
 class Alias(object):
@@ -18,4 +221,62 @@ class Alias(object):
         self.keys = tuple(keys)
 
     def __repr__(self):
-        return '<%s %r>' % ('Alias', self.keys)
\ No newline at end of file
+        return '<%s %r>' % ('Alias', self.keys)
+
+    def resolve(self, data):
+        """Resolve the alias based on the given data.
+        This is done recursively, so if one alias resolves to a second alias,
+        that second alias will also be resolved.
+        :param data: the locale data
+        :type data: `dict`
+        """
+        base = data
+        for key in self.keys:
+            data = data[key]
+        if isinstance(data, Alias):
+            data = data.resolve(base)
+        elif isinstance(data, tuple):
+            alias, others = data
+            data = alias.resolve(base)
+        return data
+
+
+class LocaleDataDict(MutableMapping):
+    """Dictionary wrapper that automatically resolves aliases to the actual
+    values.
+    """
+
+    def __init__(self, data, base=None):
+        self._data = data
+        if base is None:
+            base = data
+        self.base = base
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, key):
+        orig = val = self._data[key]
+        if isinstance(val, Alias):  # resolve an alias
+            val = val.resolve(self.base)
+        if isinstance(val, tuple):  # Merge a partial dict with an alias
+            alias, others = val
+            val = alias.resolve(self.base).copy()
+            merge(val, others)
+        if type(val) is dict:  # Return a nested alias-resolving dict
+            val = LocaleDataDict(val, base=self.base)
+        if val is not orig:
+            self._data[key] = val
+        return val
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def copy(self):
+        return LocaleDataDict(self._data.copy(), base=self.base)
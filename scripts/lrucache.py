@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+    lrucache
+    ~~~~~~~~~~~~~~~~
+    A bounded least-recently-used cache with hit/miss statistics, used to
+    memoize the pattern parsers.
+
+    Every cache created with a name is registered in `caches`, so that all
+    of them can be resized or inspected in one place:
+
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache['a'] = 1; cache['b'] = 2
+    >>> cache.get('a')
+    1
+    >>> cache['c'] = 3
+    >>> 'b' in cache
+    False
+    >>> cache.stats()['evictions']
+    1
+"""
+import sys
+from collections import OrderedDict
+from functools import wraps
+
+#: Default maximum number of entries of a cache
+DEFAULT_MAXSIZE = 1024
+
+#: All named caches, by name
+caches = {}
+
+_missing = object()
+
+
+class LRUCache(object):
+    """A mapping that holds at most `maxsize` entries, evicting the least
+    recently used one when full.
+
+    The cache keeps count of hits, misses and evictions, and of the
+    approximate memory used by its keys and values (their shallow size as
+    reported by `sys.getsizeof`).
+
+    :param maxsize: the maximum number of entries; ``None`` for no limit
+    :param name: if given, register the cache in `caches` under this name
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, name=None):
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()
+        self._sizes = {}
+        self.hits = self.misses = self.evictions = self.bytes = 0
+        if name is not None:
+            caches[name] = self
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the value for `key` and mark it as most recently used, or
+        `default` if it is not cached."""
+        value = self._data.pop(key, _missing)
+        if value is _missing:
+            self.misses += 1
+            return default
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self._discard(key)
+        self._data[key] = value
+        self._sizes[key] = size = sys.getsizeof(key) + sys.getsizeof(value)
+        self.bytes += size
+        self._shrink()
+
+    def _discard(self, key):
+        del self._data[key]
+        self.bytes -= self._sizes.pop(key)
+
+    def _shrink(self):
+        if self.maxsize is None:
+            return
+        while len(self._data) > self.maxsize:
+            self._discard(next(iter(self._data)))
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """Change the maximum number of entries, evicting entries if needed."""
+        self.maxsize = maxsize
+        self._shrink()
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        self._data.clear()
+        self._sizes.clear()
+        self.hits = self.misses = self.evictions = self.bytes = 0
+
+    def stats(self):
+        """Return the statistics of the cache as a dict."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'bytes': self.bytes,
+        }
+
+
+def memoize(cache, copy=None):
+    """Decorator that caches the results of a function of hashable
+    positional arguments in `cache`.  Exceptions are not cached.
+
+    :param cache: the `LRUCache` to store the results in
+    :param copy: if given, called on a cached result before it is returned,
+                 so that callers can not modify the cached value
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            result = cache.get(args, _missing)
+            if result is _missing:
+                result = cache[args] = func(*args)
+            return result if copy is None else copy(result)
+        wrapper.cache = cache
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorator
+
+
+def resize_all(maxsize):
+    """Set the maximum size of all named caches."""
+    for cache in caches.values():
+        cache.resize(maxsize)
+
+
+def cache_stats():
+    """Return the statistics of all named caches, by name."""
+    return dict((name, cache.stats()) for name, cache in caches.items())
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+    manifest
+    ~~~~~~~~~~~~~~~~
+    Bookkeeping for incremental CLDR imports.
+
+    The manifest records the CLDR revision, a content hash of every source
+    file that was read, a hash of the importer code itself and the importer
+    options, together with the list of inputs each output was built from.
+    An output only has to be regenerated when one of its inputs, the importer
+    or its options changed.
+"""
+import hashlib
+import json
+import os
+import re
+
+#: Bumped whenever the layout of the manifest file changes
+MANIFEST_VERSION = 1
+
+BLKSIZE = 131072
+
+_revision_re = re.compile(b'version number="\\$Revision: (\\d+)')
+
+
+def file_digest(filenames):
+    """Return the SHA-1 hex digest over the contents of `filenames`."""
+    h = hashlib.sha1()
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            while 1:
+                blk = f.read(BLKSIZE)
+                if not blk:
+                    break
+                h.update(blk)
+    return h.hexdigest()
+
+
+def read_revision(filename):
+    """Read the ``$Revision`` number from the header of a CLDR XML file."""
+    with open(filename, 'rb') as f:
+        blob = f.read(4096)
+    return int(_revision_re.search(blob).group(1))
+
+
+class Manifest(object):
+    """The input hashes of one import run, compared against the previous run.
+
+    :param srcdir: CLDR ``common`` directory; inputs are named relative to it
+    :param code_files: source files of the importer
+    :param options: importer options that change the produced data
+    """
+
+    def __init__(self, srcdir, code_files, options=None):
+        self.srcdir = srcdir
+        self.importer = file_digest(sorted(code_files))
+        self.options = options or {}
+        self.cldr_revision = read_revision(
+            os.path.join(srcdir, 'supplemental', 'supplementalData.xml'))
+        self.inputs = {}
+        self.outputs = {}
+        self.previous = {}
+
+    def load(self, path):
+        """Load the manifest of the previous run from `path`, if any."""
+        if not os.path.isfile(path):
+            return
+        with open(path) as f:
+            try:
+                previous = json.load(f)
+            except ValueError:
+                return
+        if previous.get('version') == MANIFEST_VERSION:
+            self.previous = previous
+
+    def save(self, path):
+        data = {
+            'version': MANIFEST_VERSION,
+            'cldr_revision': self.cldr_revision,
+            'importer': self.importer,
+            'options': self.options,
+            'inputs': self.inputs,
+            'outputs': self.outputs,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.rename(tmp_path, path)
+
+    def digest(self, name):
+        """Return the content hash of the input file `name`."""
+        if name not in self.inputs:
+            self.inputs[name] = file_digest([os.path.join(self.srcdir, name)])
+        return self.inputs[name]
+
+    def is_current(self, output, inputs):
+        """Check whether `output` was built from exactly these `inputs` by
+        this version of the importer.
+
+        :param output: output name, e.g. ``'global'`` or a locale stem
+        :param inputs: input file names, relative to the source directory
+        """
+        previous = self.previous
+        if (previous.get('importer') != self.importer or
+                previous.get('options') != self.options or
+                previous.get('cldr_revision') != self.cldr_revision):
+            return False
+        if previous['outputs'].get(output) != sorted(inputs):
+            return False
+        for name in inputs:
+            if previous['inputs'].get(name) != self.digest(name):
+                return False
+        return True
+
+    def record(self, output, inputs):
+        """Record that `output` has been built from `inputs`."""
+        for name in inputs:
+            self.digest(name)
+        self.outputs[output] = sorted(inputs)
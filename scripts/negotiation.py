@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+    negotiation
+    ~~~~~~~~~~~~~~~~
+    Locale identifier canonicalization, the CLDR likely subtags algorithms
+    and the negotiation of a locale between the locales a client asks for
+    and the locales an application supports.
+
+    Locale identifiers are handled as ``(language, script, territory,
+    variant)`` tuples, with ``None`` for missing subtags:
+
+    >>> likely = {'en': 'en_Latn_US', 'und_GB': 'en_Latn_GB', 'zh_TW': 'zh_Hant_TW'}
+    >>> maximize(parse_locale('zh-TW'), likely)
+    ('zh', 'Hant', 'TW', None)
+    >>> minimize(('en', 'Latn', 'GB', None), likely)
+    ('en', None, 'GB', None)
+
+    A `LocaleMatcher` compares the maximized forms, so that a request for
+    ``en-GB`` matches a supported ``en_Latn_GB`` and a request for ``en-AU``
+    falls back to the default English of the application:
+
+    >>> matcher = LocaleMatcher(['en', 'en_Latn_GB', 'de'], default='en',
+    ...                         global_data={'likely_subtags': likely})
+    >>> matcher.match_header('en-GB;q=0.8, fr')
+    'en_Latn_GB'
+    >>> matcher.match_header('en-AU, de;q=0.5')
+    'en'
+    >>> matcher.match_header('de-DE-u-co-phonebk, fr')
+    'de'
+"""
+import re
+
+from localedata import get_global
+from lrucache import DEFAULT_MAXSIZE, LRUCache
+from territories import Containment
+
+_language_re = re.compile(r'^(?:[a-z]{2,3}|[a-z]{5,8}|root)$')
+_script_re = re.compile(r'^[a-z]{4}$')
+_territory_re = re.compile(r'^(?:[a-z]{2}|[0-9]{3})$')
+_variant_re = re.compile(r'^(?:[0-9][a-z0-9]{3}|[a-z0-9]{5,8})$')
+_singleton_re = re.compile(r'^[a-z0-9]$')
+
+_missing = object()
+
+
+def parse_locale(identifier):
+    """Parse a locale identifier or language tag into a ``(language, script,
+    territory, variant)`` tuple.  Subtags may be separated by ``_`` or ``-``;
+    an encoding or modifier suffix (``.UTF-8``, ``@euro``) is ignored, and
+    so are the extensions and private use subtags of a language tag, from
+    the first single character subtag on.  Several variants are joined
+    with ``_``.
+
+    >>> parse_locale('zh_Hant_TW')
+    ('zh', 'Hant', 'TW', None)
+    >>> parse_locale('DE-at')
+    ('de', None, 'AT', None)
+    >>> parse_locale('de-DE-u-co-phonebk-x-private')
+    ('de', None, 'DE', None)
+    >>> parse_locale('sl-rozaj-biske')
+    ('sl', None, None, 'ROZAJ_BISKE')
+
+    :raise `ValueError`: if the identifier is not a valid locale identifier
+    """
+    parts = re.split('[_-]', identifier.split('.', 1)[0].split('@', 1)[0])
+    language = parts.pop(0).lower()
+    if not _language_re.match(language):
+        raise ValueError('expected a language subtag in %r' % identifier)
+    script = territory = None
+    if parts and _script_re.match(parts[0].lower()):
+        script = parts.pop(0).title()
+    if parts and _territory_re.match(parts[0].lower()):
+        territory = parts.pop(0).upper()
+    variants = []
+    while parts and _variant_re.match(parts[0].lower()):
+        variants.append(parts.pop(0).upper())
+    if parts and not _singleton_re.match(parts[0].lower()):
+        raise ValueError('%r is not a valid locale identifier' % identifier)
+    return language, script, territory, '_'.join(variants) or None
+
+
+def format_locale(parts):
+    """Return the ``_`` separated identifier of a locale tuple.
+
+    >>> format_locale(('sr', 'Latn', None, None))
+    'sr_Latn'
+    """
+    return '_'.join(part for part in parts if part)
+
+
+def canonicalize(parts, global_data, likely_subtags=None):
+    """Replace the deprecated subtags of a locale tuple by their
+    replacements from the alias tables of the global data.
+
+    >>> canonicalize(('iw', None, 'DD', None),
+    ...              {'language_aliases': {'iw': 'he'}, 'territory_aliases': {'DD': ['DE']}})
+    ('he', None, 'DE', None)
+
+    :param global_data: a mapping with the ``language_aliases``,
+                        ``script_aliases``, ``territory_aliases`` and
+                        ``variant_aliases`` of the global data
+    :param likely_subtags: used to choose between the replacements of a
+                           territory that was split up
+    """
+    language, script, territory, variant = parts
+    replacement = global_data.get('language_aliases', {}).get(language)
+    if replacement:
+        language, new_script, new_territory, new_variant = parse_locale(replacement)
+        script = script or new_script
+        territory = territory or new_territory
+        variant = variant or new_variant
+    if script:
+        script = global_data.get('script_aliases', {}).get(script, script)
+    replacements = global_data.get('territory_aliases', {}).get(territory)
+    if replacements:
+        territory = replacements[0]
+        if len(replacements) > 1 and likely_subtags:
+            likely = maximize((language, script, None, None), likely_subtags)[2]
+            if likely in replacements:
+                territory = likely
+    if variant:
+        variants = []
+        for name in variant.split('_'):
+            replacement = global_data.get('variant_aliases', {}).get(name, name)
+            if _territory_re.match(replacement.lower()):
+                territory = territory or replacement
+            else:
+                variants.append(replacement)
+        variant = '_'.join(variants) or None
+    return language, script, territory, variant
+
+
+def maximize(parts, likely_subtags):
+    """Add the likely script and territory to a locale tuple (the "Add Likely
+    Subtags" algorithm of UTS #35).  Returns the tuple unchanged if the
+    likely subtags do not cover it.
+
+    :param likely_subtags: the ``likely_subtags`` of the global data
+    """
+    language, script, territory, variant = parts
+    if language == 'root':
+        language = 'und'
+    for key in ((language, script, territory), (language, territory),
+                (language, script), (language,), ('und', script)):
+        if None in key:
+            continue
+        match = likely_subtags.get('_'.join(key))
+        if match:
+            likely = parse_locale(match)
+            return ((language if language != 'und' else likely[0]),
+                    script or likely[1], territory or likely[2], variant)
+    return language, script, territory, variant
+
+
+def minimize(parts, likely_subtags, minimal=None):
+    """Remove the script and territory of a locale tuple where the likely
+    subtags add them back (the "Remove Likely Subtags" algorithm of
+    UTS #35).
+
+    :param likely_subtags: the ``likely_subtags`` of the global data
+    :param minimal: the ``likely_minimal`` table of the global data, which
+                    holds the result for the maximized locales it lists
+    """
+    maximal = maximize(parts, likely_subtags)
+    variant = maximal[3]
+    if minimal:
+        result = minimal.get(format_locale(maximal[:3]))
+        if result:
+            return parse_locale(result)[:3] + (variant,)
+    language, script, territory = maximal[:3]
+    for trial in ((language, None, None, None), (language, None, territory, None),
+                  (language, script, None, None)):
+        if maximize(trial, likely_subtags)[:3] == maximal[:3]:
+            return trial[:3] + (variant,)
+    return maximal
+
+
+def minimal_table(likely_subtags):
+    """Return the minimized identifier of every maximized locale in
+    `likely_subtags`, as stored in the ``likely_minimal`` global data."""
+    result = {}
+    for value in sorted(set(likely_subtags.values())):
+        result[value] = format_locale(minimize(parse_locale(value), likely_subtags))
+    return result
+
+
+def parse_accept_language(header):
+    """Return the language tags of an HTTP ``Accept-Language`` header, most
+    preferred first.  Tags with a quality of zero and the ``*`` wildcard are
+    left out.
+
+    >>> parse_accept_language('fr;q=0.5, en-GB, *;q=0.1, de;q=0')
+    ['en-GB', 'fr']
+    """
+    result = []
+    for idx, item in enumerate(header.split(',')):
+        params = item.split(';')
+        tag = params.pop(0).strip()
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if tag and tag != '*' and quality > 0:
+            result.append((-quality, idx, tag))
+    result.sort()
+    return [tag for _, _, tag in result]
+
+
+class LocaleMatcher(object):
+    """Chooses the best of a set of supported locales for the locales a
+    client asks for.
+
+    A requested locale matches the supported locale with the same maximized
+    language, script and territory, or else the first supported locale with
+    the same language and script for a region containing its territory
+    (``es_419`` for ``es_MX``), or else the supported locale with the same
+    language and script that is the likeliest for them (or, if none is, the
+    first such supported locale).  The first requested locale that
+    matches wins.  The supported locales are maximized once, and the
+    results of `match_header` are cached.
+
+    :param supported: the supported locale identifiers, most preferred first
+    :param default: the locale returned when nothing matches
+    :param global_data: a mapping with the alias tables, ``likely_subtags``,
+                        ``likely_minimal`` and ``territory_containment``;
+                        by default, the global data
+    :param cache_size: the maximum number of cached `match_header` results
+    """
+
+    def __init__(self, supported, default=None, global_data=None,
+                 cache_size=DEFAULT_MAXSIZE):
+        if global_data is None:
+            global_data = dict((key, get_global(key)) for key in (
+                'language_aliases', 'script_aliases', 'territory_aliases',
+                'variant_aliases', 'likely_subtags', 'likely_minimal',
+                'territory_containment'))
+        self.supported = list(supported)
+        self.default = default
+        self._global_data = global_data
+        self._likely = global_data.get('likely_subtags', {})
+        self._exact = {}
+        self._closest = {}
+        self._regional = {}
+        containment = global_data.get('territory_containment')
+        self._containment = Containment(containment) if containment else None
+        likeliest = {}
+        for identifier in self.supported:
+            maximal = self.maximize(identifier)
+            if maximal is None:
+                continue
+            self._exact.setdefault(maximal[:3], identifier)
+            group = maximal[:2]
+            if maximal[2] and maximal[2].isdigit():
+                self._regional.setdefault(group, []).append((maximal[2], identifier))
+            if group not in likeliest:
+                likeliest[group] = maximize(group + (None, None), self._likely)[:3]
+            if (group not in self._closest or
+                    (maximal[:3] == likeliest[group] and
+                     self._exact[likeliest[group]] == identifier)):
+                self._closest[group] = identifier
+        self._cache = LRUCache(cache_size)
+
+    def maximize(self, identifier):
+        """Return the canonicalized and maximized tuple of a locale
+        identifier, or ``None`` if it is not a valid identifier."""
+        try:
+            parts = parse_locale(identifier)
+        except ValueError:
+            return None
+        return maximize(canonicalize(parts, self._global_data, self._likely), self._likely)
+
+    def minimize(self, identifier):
+        """Return the canonicalized and minimized form of a locale
+        identifier, or ``None`` if it is not a valid identifier."""
+        maximal = self.maximize(identifier)
+        if maximal is None:
+            return None
+        return format_locale(minimize(maximal, self._likely,
+                                      self._global_data.get('likely_minimal')))
+
+    def match(self, requested):
+        """Return the best supported locale for a list of requested locale
+        identifiers, most preferred first, or the default locale."""
+        for identifier in requested:
+            maximal = self.maximize(identifier)
+            if maximal is None:
+                continue
+            result = self._exact.get(maximal[:3])
+            if result:
+                return result
+            if self._containment and maximal[2]:
+                for region, result in self._regional.get(maximal[:2], ()):
+                    if self._containment.contains(region, maximal[2]):
+                        return result
+            result = self._closest.get(maximal[:2])
+            if result:
+                return result
+        return self.default
+
+    def match_header(self, header):
+        """Return the best supported locale for an HTTP ``Accept-Language``
+        header; see `match`."""
+        result = self._cache.get(header, _missing)
+        if result is _missing:
+            result = self._cache[header] = self.match(parse_accept_language(header))
+        return result
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+    packdata
+    ~~~~~~~~~~~~~~~~
+    A small, dependency-free MessagePack encoder and decoder.
+
+    Only the types that occur in the imported locale data are supported:
+    ``None``, booleans, integers, floats, text, bytes, lists/tuples, dicts
+    and extension types (`ExtType`).  Anything else is passed through the
+    `default` callback of `packb`, which must return one of those types.
+
+    See https://github.com/msgpack/msgpack/blob/master/spec.md
+"""
+import struct
+from collections import namedtuple
+
+from _compat import integer_types, iteritems, string_types
+
+_pack_cache = {}
+
+#: An application-defined MessagePack extension value
+ExtType = namedtuple('ExtType', 'code data')
+
+_fixext_tags = {1: 0xd4, 2: 0xd5, 4: 0xd6, 8: 0xd7, 16: 0xd8}
+
+
+def _struct(fmt):
+    try:
+        return _pack_cache[fmt]
+    except KeyError:
+        _pack_cache[fmt] = s = struct.Struct(fmt)
+        return s
+
+
+def _pack_length(n, fix_tag, fix_max, tags, write):
+    if n <= fix_max:
+        write(_struct('>B').pack(fix_tag | n))
+    elif n <= 0xff and tags[0] is not None:
+        write(_struct('>BB').pack(tags[0], n))
+    elif n <= 0xffff:
+        write(_struct('>BH').pack(tags[1], n))
+    else:
+        write(_struct('>BI').pack(tags[2], n))
+
+
+def _pack_int(obj, write):
+    if 0 <= obj < 0x80:
+        write(_struct('>B').pack(obj))
+    elif -0x20 <= obj < 0:
+        write(_struct('>b').pack(obj))
+    elif obj >= 0:
+        if obj <= 0xff:
+            write(_struct('>BB').pack(0xcc, obj))
+        elif obj <= 0xffff:
+            write(_struct('>BH').pack(0xcd, obj))
+        elif obj <= 0xffffffff:
+            write(_struct('>BI').pack(0xce, obj))
+        else:
+            write(_struct('>BQ').pack(0xcf, obj))
+    else:
+        if obj >= -0x80:
+            write(_struct('>Bb').pack(0xd0, obj))
+        elif obj >= -0x8000:
+            write(_struct('>Bh').pack(0xd1, obj))
+        elif obj >= -0x80000000:
+            write(_struct('>Bi').pack(0xd2, obj))
+        else:
+            write(_struct('>Bq').pack(0xd3, obj))
+
+
+def _pack(obj, write, default):
+    if obj is None:
+        write(b'\xc0')
+    elif obj is True:
+        write(b'\xc3')
+    elif obj is False:
+        write(b'\xc2')
+    elif isinstance(obj, integer_types):
+        _pack_int(obj, write)
+    elif isinstance(obj, float):
+        write(_struct('>Bd').pack(0xcb, obj))
+    elif isinstance(obj, string_types):
+        data = obj.encode('utf-8')
+        _pack_length(len(data), 0xa0, 31, (0xd9, 0xda, 0xdb), write)
+        write(data)
+    elif isinstance(obj, bytes):
+        _pack_length(len(obj), 0xc4, -1, (0xc4, 0xc5, 0xc6), write)
+        write(obj)
+    elif isinstance(obj, ExtType):
+        tag = _fixext_tags.get(len(obj.data))
+        if tag is not None:
+            write(_struct('>Bb').pack(tag, obj.code))
+        else:
+            _pack_length(len(obj.data), 0xc7, -1, (0xc7, 0xc8, 0xc9), write)
+            write(_struct('>b').pack(obj.code))
+        write(obj.data)
+    elif isinstance(obj, (list, tuple)):
+        _pack_length(len(obj), 0x90, 15, (None, 0xdc, 0xdd), write)
+        for item in obj:
+            _pack(item, write, default)
+    elif isinstance(obj, dict):
+        _pack_length(len(obj), 0x80, 15, (None, 0xde, 0xdf), write)
+        for key, value in iteritems(obj):
+            _pack(key, write, default)
+            _pack(value, write, default)
+    elif default is not None:
+        _pack(default(obj), write, None)
+    else:
+        raise TypeError('can not serialize %r' % (obj,))
+
+
+def packb(obj, default=None):
+    """Serialize `obj` to MessagePack bytes.
+
+    :param default: called with any object of an unsupported type; should
+                    return a serializable replacement
+    """
+    buf = []
+    _pack(obj, buf.append, default)
+    return b''.join(buf)
+
+
+class _Unpacker(object):
+
+    def __init__(self, data, ext_hook=None):
+        self.data = data
+        self.pos = 0
+        self.ext_hook = ext_hook
+
+    def take(self, fmt):
+        s = _struct(fmt)
+        value = s.unpack_from(self.data, self.pos)
+        self.pos += s.size
+        return value
+
+    def raw(self, n):
+        start = self.pos
+        self.pos += n
+        chunk = self.data[start:self.pos]
+        if not isinstance(chunk, bytes):
+            chunk = bytes(chunk)
+        return chunk
+
+    def text(self, n):
+        return self.raw(n).decode('utf-8')
+
+    def ext(self, n):
+        code = self.take('>b')[0]
+        data = self.raw(n)
+        if self.ext_hook is None:
+            return ExtType(code, data)
+        return self.ext_hook(code, data)
+
+    def array(self, n):
+        return [self.unpack() for _ in range(n)]
+
+    def map(self, n):
+        result = {}
+        for _ in range(n):
+            key = self.unpack()
+            if isinstance(key, list):
+                key = _freeze(key)
+            result[key] = self.unpack()
+        return result
+
+    def unpack(self):
+        tag = self.take('>B')[0]
+        if tag <= 0x7f:
+            return tag
+        if tag >= 0xe0:
+            return tag - 0x100
+        if tag <= 0x8f:
+            return self.map(tag & 0x0f)
+        if tag <= 0x9f:
+            return self.array(tag & 0x0f)
+        if tag <= 0xbf:
+            return self.text(tag & 0x1f)
+        try:
+            reader, arg = _READERS[tag]
+        except KeyError:
+            raise ValueError('unsupported MessagePack type 0x%02x at offset %d'
+                             % (tag, self.pos - 1))
+        return reader(self, arg)
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+_READERS = {
+    0xc0: (lambda u, _: None, None),
+    0xc2: (lambda u, _: False, None),
+    0xc3: (lambda u, _: True, None),
+    0xc4: (lambda u, fmt: u.raw(u.take(fmt)[0]), '>B'),
+    0xc5: (lambda u, fmt: u.raw(u.take(fmt)[0]), '>H'),
+    0xc6: (lambda u, fmt: u.raw(u.take(fmt)[0]), '>I'),
+    0xc7: (lambda u, fmt: u.ext(u.take(fmt)[0]), '>B'),
+    0xc8: (lambda u, fmt: u.ext(u.take(fmt)[0]), '>H'),
+    0xc9: (lambda u, fmt: u.ext(u.take(fmt)[0]), '>I'),
+    0xca: (lambda u, fmt: u.take(fmt)[0], '>f'),
+    0xcb: (lambda u, fmt: u.take(fmt)[0], '>d'),
+    0xcc: (lambda u, fmt: u.take(fmt)[0], '>B'),
+    0xcd: (lambda u, fmt: u.take(fmt)[0], '>H'),
+    0xce: (lambda u, fmt: u.take(fmt)[0], '>I'),
+    0xcf: (lambda u, fmt: u.take(fmt)[0], '>Q'),
+    0xd0: (lambda u, fmt: u.take(fmt)[0], '>b'),
+    0xd1: (lambda u, fmt: u.take(fmt)[0], '>h'),
+    0xd2: (lambda u, fmt: u.take(fmt)[0], '>i'),
+    0xd3: (lambda u, fmt: u.take(fmt)[0], '>q'),
+    0xd4: (lambda u, n: u.ext(n), 1),
+    0xd5: (lambda u, n: u.ext(n), 2),
+    0xd6: (lambda u, n: u.ext(n), 4),
+    0xd7: (lambda u, n: u.ext(n), 8),
+    0xd8: (lambda u, n: u.ext(n), 16),
+    0xd9: (lambda u, fmt: u.text(u.take(fmt)[0]), '>B'),
+    0xda: (lambda u, fmt: u.text(u.take(fmt)[0]), '>H'),
+    0xdb: (lambda u, fmt: u.text(u.take(fmt)[0]), '>I'),
+    0xdc: (lambda u, fmt: u.array(u.take(fmt)[0]), '>H'),
+    0xdd: (lambda u, fmt: u.array(u.take(fmt)[0]), '>I'),
+    0xde: (lambda u, fmt: u.map(u.take(fmt)[0]), '>H'),
+    0xdf: (lambda u, fmt: u.map(u.take(fmt)[0]), '>I'),
+}
+
+
+def unpackb(data, offset=0, ext_hook=None):
+    """Deserialize one MessagePack object from `data`.
+
+    Arrays are returned as lists, except when used as map keys, where they
+    are returned as tuples.
+
+    :param data: bytes, or any buffer such as a `memoryview` or `mmap`
+    :param offset: position of the object in `data`
+    :param ext_hook: called with the code and data of every extension value;
+                     by default extension values are returned as `ExtType`
+    """
+    unpacker = _Unpacker(data, ext_hook)
+    unpacker.pos = offset
+    return unpacker.unpack()
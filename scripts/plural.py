@@ -6,8 +6,14 @@
     :copyright: (c) 2013 by the Babel Team.
     :license: BSD, see LICENSE for more details.
 """
+import decimal
 import re
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 _plural_tags = ('zero', 'one', 'two', 'few', 'many', 'other')
 _fallback_tag = 'other'
@@ -24,14 +30,22 @@ class PluralRule(object):
     'one'
     >>> rule(2)
     'other'
+
     Currently the CLDR defines these tags: zero, one, two, few, many and
     other where other is an implicit default.  Rules should be mutually
     exclusive; for a given numeric value, only one rule should apply (i.e.
     the condition should only be true for one of the plural rule elements.
+
+    The ``@integer`` and ``@decimal`` samples of the rules are kept by tag
+    in `samples`, see `parse_samples`:
+    >>> rule = PluralRule({'one': 'n is 1 @integer 1 @decimal 1.0, 1.00'})
+    >>> rule.samples['one']['decimal']
+    [('1.0', '1.0'), ('1.00', '1.00')]
+
     .. _`CLDR rules`: http://www.unicode.org/reports/tr35/tr35-33/tr35-numbers.html#Language_Plural_Rules
     """
 
-    __slots__ = ('abstract', '_func')
+    __slots__ = ('abstract', 'samples', '_func', '_array_func')
 
     def __init__(self, rules):
         """Initialize the rule instance.
@@ -44,15 +58,18 @@ class PluralRule(object):
             rules = rules.items()
         found = set()
         self.abstract = []
+        self.samples = {}
         for key, expr in sorted(list(rules)):
             if key not in _plural_tags:
                 raise ValueError('unknown tag %r' % key)
             elif key in found:
                 raise ValueError('tag %r defined twice' % key)
             found.add(key)
-            ast = _Parser(expr).ast
-            if ast:
-                self.abstract.append((key, ast))
+            parser = _Parser(expr)
+            if parser.ast:
+                self.abstract.append((key, parser.ast))
+            if parser.samples:
+                self.samples[key] = parser.samples
 
     def __repr__(self):
         rules = self.rules
@@ -82,6 +99,327 @@ class PluralRule(object):
 
     def __setstate__(self, abstract):
         self.abstract = abstract
+        self.samples = {}
+
+    def __call__(self, n):
+        if not hasattr(self, '_func'):
+            self._func = to_python(self)
+        return self._func(n)
+
+    def evaluate_array(self, values):
+        """Evaluate the rule on all numbers of a NumPy array at once, see
+        `to_numpy`.  Returns an array of category codes: the index of each
+        tag in ``('zero', 'one', 'two', 'few', 'many', 'other')``, which is
+        also the order of the Rust ``PluralCategory`` variants.
+        """
+        if not hasattr(self, '_array_func'):
+            self._array_func = to_numpy(self)
+        return self._array_func(values)
+
+
+def extract_operands(source):
+    """Extract operands from a decimal, a float or an int, according to
+    `CLDR rules`_.
+    >>> extract_operands(decimal.Decimal('1.50'))
+    (Decimal('1.50'), 1, 2, 1, 50, 5)
+    >>> extract_operands(3.0)
+    (3, 3, 0, 0, 0, 0)
+    >>> extract_operands(0.05)
+    (Decimal('0.05'), 0, 2, 2, 5, 5)
+
+    Floats carry no information about visible fraction digits, so pass a
+    `decimal.Decimal` when trailing zeros are significant.
+    .. _`CLDR rules`: http://www.unicode.org/reports/tr35/tr35-33/tr35-numbers.html#Operands
+    """
+    n = abs(source)
+    i = int(n)
+    if isinstance(n, float):
+        if i == n:
+            n = i
+        else:
+            # Cast the `float` to a number via the string representation.
+            n = decimal.Decimal(str(n))
+    if isinstance(n, decimal.Decimal):
+        exp = n.as_tuple().exponent
+        digits = ''.join(str(d) for d in n.as_tuple().digits)
+        # The fraction digits include the zeros after the point, as in 0.05
+        trailing = digits[exp:].rjust(-exp, '0') if exp < 0 else ''
+        no_trailing = trailing.rstrip('0')
+        v = len(trailing)
+        w = len(no_trailing)
+        f = int(trailing or 0)
+        t = int(no_trailing or 0)
+    else:
+        v = w = f = t = 0
+    return n, i, v, w, f, t
+
+
+def extract_operands_array(values):
+    """Extract the operands of every number of a NumPy array, like
+    `extract_operands` does for one number.  Returns the ``(n, i, v, w, f,
+    t)`` arrays; `n` and `i` are unsigned integers for an integer array and
+    floats otherwise.  Floats are taken as float64.
+
+    The fraction digits of a float are those of its shortest repr, found as
+    the fewest decimals that round-trip to the float.  Floats too close to
+    the precision limit for the array arithmetic to decide that, non-finite
+    floats and the items of object arrays (such as `decimal.Decimal`) go
+    through `extract_operands` one by one.
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind in 'iu':
+        i = numpy.abs(values).astype(numpy.uint64)
+        zeros = numpy.zeros(i.shape, numpy.int64)
+        return i, i, zeros, zeros, zeros, zeros
+    if values.dtype.kind == 'f':
+        n = numpy.abs(values.astype(numpy.float64))
+        items = n.ravel()
+    else:
+        n = numpy.zeros(values.shape, numpy.float64)
+        items = values.ravel()
+    i = numpy.trunc(n)
+    operands = [n, i] + [numpy.zeros(n.shape, numpy.int64) for _ in 'vwft']
+    flats = [operand.ravel() for operand in operands]
+    flat_n, flat_i, flat_v, flat_w, flat_f, flat_t = flats
+
+    if values.dtype.kind == 'f':
+        pending = numpy.flatnonzero((n != i) & numpy.isfinite(n))
+        fallback = [numpy.flatnonzero(~numpy.isfinite(n))]
+    else:
+        pending = numpy.zeros(0, numpy.intp)
+        fallback = [numpy.arange(n.size)]
+    for digits in range(1, 23):  # the powers of ten floats hold exactly
+        if not len(pending):
+            break
+        scale = 10.0 ** digits
+        value = flat_n[pending]
+        candidate = numpy.rint(value * scale)
+        # Past this precision the nearest candidate is not reliable
+        lost = numpy.spacing(value) * scale >= 0.25
+        found = ~lost & (candidate / scale == value)
+        done = pending[found]
+        # The fewest round-tripping decimals have no trailing zeros
+        flat_v[done] = flat_w[done] = digits
+        flat_f[done] = flat_t[done] = candidate[found] - flat_i[done] * scale
+        fallback.append(pending[lost])
+        pending = pending[~found & ~lost]
+    fallback.append(pending)
+
+    for idx in numpy.concatenate(fallback):
+        for flat, operand in zip(flats, extract_operands(items[idx])):
+            flat[idx] = operand
+    return tuple(operands)
+
+
+def interpret(rule, n):
+    """Evaluate a list/dict of rules or a `PluralRule` object on the number
+    `n` by walking the abstract syntax trees, following the definitions of
+    UTS #35 as literally as possible.  This is the reference the compiled
+    and vectorized forms of the rules are checked against:
+    >>> interpret({'one': 'n in 1', 'few': 'n within 2..4'}, 2.5)
+    'few'
+
+    :param rule: the rules as list or dict, or a `PluralRule` object
+    :param n: an int, a float or a `decimal.Decimal`
+    :raise RuleError: if the expression is malformed
+    """
+    if not isinstance(rule, PluralRule):
+        rule = PluralRule(rule)
+    evaluate = _Interpreter(extract_operands(n)).evaluate
+    for tag, ast in _ordered(rule):
+        if evaluate(ast):
+            return tag
+    return _fallback_tag
+
+
+def to_python(rule):
+    """Convert a list/dict of rules or a `PluralRule` object into a regular
+    Python function.  The operands are extracted once per call and the rules
+    are tested one after the other:
+    >>> func = to_python({'one': 'n is 1', 'few': 'n in 2..4'})
+    >>> func(1)
+    'one'
+    >>> func(3)
+    'few'
+    >>> func(3.5)
+    'other'
+
+    :param rule: the rules as list or dict, or a `PluralRule` object
+    :raise RuleError: if the expression is malformed
+    """
+    namespace = {'extract_operands': extract_operands}
+    exec(compile(_python_source(rule), '<rule>', 'exec'), namespace)
+    return namespace['evaluate']
+
+
+def _python_source(rule):
+    if not isinstance(rule, PluralRule):
+        rule = PluralRule(rule)
+    to_python = _PythonCompiler().compile
+    result = [
+        'def evaluate(n):',
+        '    n, i, v, w, f, t = extract_operands(n)',
+    ]
+    for tag, ast in _ordered(rule):
+        result.append('    if %s: return %r' % (to_python(ast), str(tag)))
+    result.append('    return %r' % _fallback_tag)
+    return '\n'.join(result)
+
+
+def to_numpy(rule):
+    """Convert a list/dict of rules or a `PluralRule` object into a Python
+    function that evaluates the rules on a whole NumPy array of numbers.
+    The operands are extracted with `extract_operands_array`, each rule is
+    evaluated with array operations, and the function returns an array of
+    category codes, as described in `PluralRule.evaluate_array`.
+    Requires NumPy.
+
+    :param rule: the rules as list or dict, or a `PluralRule` object
+    :raise RuleError: if the expression is malformed
+    """
+    if numpy is None:
+        raise ImportError('to_numpy requires NumPy')
+    namespace = {
+        'extract_operands_array': extract_operands_array,
+        'numpy': numpy,
+    }
+    exec(compile(_numpy_source(rule), '<rule>', 'exec'), namespace)
+    return namespace['evaluate']
+
+
+def _numpy_source(rule):
+    if not isinstance(rule, PluralRule):
+        rule = PluralRule(rule)
+    to_numpy = _NumPyCompiler().compile
+    conditions = []
+    codes = []
+    for tag, ast in _ordered(rule):
+        conditions.append(to_numpy(ast))
+        codes.append(_plural_tags.index(tag))
+    result = [
+        'def evaluate(values):',
+        '    n, i, v, w, f, t = extract_operands_array(values)',
+        '    codes = numpy.full(n.shape, %d, numpy.int8)' % _plural_tags.index(_fallback_tag),
+    ]
+    # Later rules first, so that the first matching rule wins
+    for condition, code in reversed(list(zip(conditions, codes))):
+        result.append('    codes[%s] = %d' % (condition, code))
+    result.append('    return codes')
+    return '\n'.join(result)
+
+
+def to_rust(rule, name):
+    """Convert a list/dict of rules or a `PluralRule` object into the source
+    of a Rust function called `name`.  The function takes a reference to a
+    ``PluralOperands`` value and returns a ``PluralCategory``; both types are
+    defined in ``src/plural.rs``.
+    >>> print(to_rust({'one': 'i = 1 and v = 0'}, 'cardinal_0'))
+    #[allow(unused_parens, unused_variables)]
+    fn cardinal_0(o: &PluralOperands) -> PluralCategory {
+        if ((o.i == 1) && (o.v == 0)) { return PluralCategory::One; }
+        PluralCategory::Other
+    }
+
+    :param rule: the rules as list or dict, or a `PluralRule` object
+    :param name: the name of the Rust function
+    :raise RuleError: if the expression is malformed
+    """
+    if not isinstance(rule, PluralRule):
+        rule = PluralRule(rule)
+    to_rust = _RustCompiler().compile
+    result = [
+        '#[allow(unused_parens, unused_variables)]',
+        'fn %s(o: &PluralOperands) -> PluralCategory {' % name,
+    ]
+    for tag, ast in _ordered(rule):
+        result.append('    if %s { return PluralCategory::%s; }' % (
+            to_rust(ast), tag.capitalize()))
+    result.append('    PluralCategory::%s' % _fallback_tag.capitalize())
+    result.append('}')
+    return '\n'.join(result)
+
+
+def canonical_form(rule):
+    """Return a canonical, hashable form of a list/dict of rules or of a
+    `PluralRule` object.  Rule sets that only differ in syntax (``is`` or
+    ``=``, the order of ``and``/``or`` operands and of ranges, overlapping
+    ranges) have the same canonical form:
+    >>> canonical_form({'one': 'n is 1 or n = 3'}) == \\
+    ...     canonical_form({'one': 'n in 3, 1..1'})
+    True
+
+    :param rule: the rules as list or dict, or a `PluralRule` object
+    """
+    if not isinstance(rule, PluralRule):
+        rule = PluralRule(rule)
+    return tuple((tag, _canonical(ast)) for tag, ast in _ordered(rule))
+
+
+def _canonical(node):
+    op, args = node
+    if op in ('and', 'or'):
+        operands = set()
+        stack = list(args)
+        while stack:
+            arg = stack.pop()
+            if arg[0] == op:
+                stack.extend(arg[1])
+            else:
+                operands.add(_canonical(arg))
+        if op == 'or':
+            operands = _merge_relations(operands)
+        operands = sorted(operands, key=repr)
+        result = operands[0]
+        for operand in operands[1:]:
+            result = op, (result, operand)
+        return result
+    if op == 'not':
+        inner = _canonical(args[0])
+        if inner[0] == 'not':
+            return inner[1][0]
+        return 'not', (inner,)
+    if op in ('is', 'isnot'):
+        expr, value = args
+        relation = _canonical(('relation', ('in', expr, range_list_node([(value, value)]))))
+        return ('not', (relation,)) if op == 'isnot' else relation
+    if op == 'relation':
+        method, expr, range_list = args
+        # All operands but `n` are integers, for which `within` and `in`
+        # are the same.
+        if method == 'within' and _operand(expr) != 'n':
+            method = 'in'
+        ranges = []
+        for start, end in sorted((start[1][0], end[1][0]) for start, end in range_list[1]):
+            # Adjacent integer ranges can only be joined for `in`.
+            if ranges and start <= ranges[-1][1] + (method == 'in'):
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([start, end])
+        range_list = range_list_node(tuple((value_node(start), value_node(end))
+                                           for start, end in ranges))
+        return 'relation', (method, expr, range_list)
+    return node
+
+
+def _merge_relations(operands):
+    """Join the relations in a set of canonical ``or`` operands that test the
+    same expression into one relation."""
+    result = set()
+    relations = {}
+    for operand in operands:
+        if operand[0] == 'relation':
+            method, expr, range_list = operand[1]
+            relations.setdefault((method, expr), []).extend(range_list[1])
+        else:
+            result.add(operand)
+    for (method, expr), ranges in relations.items():
+        result.add(_canonical(('relation', (method, expr, range_list_node(ranges)))))
+    return result
+
+
+def _ordered(rule):
+    """Return the ``(tag, ast)`` pairs of `rule` in the CLDR tag order."""
+    return sorted(rule.abstract, key=lambda item: _plural_tags.index(item[0]))
 
 
 class RuleError(Exception):
@@ -90,7 +428,7 @@ class RuleError(Exception):
 _VARS = 'nivwft'
 
 _RULES = [
-    (None, re.compile(r'\s+(?u)')),
+    (None, re.compile(r'(?u)\s+')),
     ('word', re.compile(r'\b(and|or|is|(?:with)?in|not|mod|[{0}])\b'
                         .format(_VARS))),
     ('value', re.compile(r'\d+')),
@@ -118,6 +456,65 @@ def tokenize_rule(s):
     return result[::-1]
 
 
+def parse_samples(s):
+    """Parse the ``@integer`` and ``@decimal`` samples of a rule into a dict
+    of lists of ``(start, end)`` ranges of decimal strings.  The ellipsis
+    that marks an open-ended list is dropped:
+    >>> samples = parse_samples(u'i = 1 @integer 1, 3~5, \u2026 @decimal 1.0~1.2')
+    >>> samples['integer']
+    [('1', '1'), ('3', '5')]
+    >>> samples['decimal']
+    [('1.0', '1.2')]
+    """
+    samples = {}
+    for part in s.split('@')[1:]:
+        kind, _, values = part.strip().partition(' ')
+        if kind not in ('integer', 'decimal'):
+            raise RuleError('unknown sample type %r' % kind)
+        ranges = samples.setdefault(kind, [])
+        for item in values.split(','):
+            item = item.strip()
+            if not item or item in (u'\u2026', '...'):
+                continue
+            start, _, end = item.partition('~')
+            ranges.append((start.strip(), (end or start).strip()))
+    return samples
+
+
+def expand_samples(ranges):
+    """Expand sample ranges into the list of the numbers they stand for, as
+    `decimal.Decimal` values with as many fraction digits as the range
+    bounds:
+    >>> [str(value) for value in expand_samples([('0.8', '1.1'), ('5', '5')])]
+    ['0.8', '0.9', '1.0', '1.1', '5']
+    """
+    result = []
+    for start, end in ranges:
+        start = decimal.Decimal(start)
+        end = decimal.Decimal(end)
+        step = decimal.Decimal(1).scaleb(start.as_tuple().exponent)
+        value = start
+        while value <= end:
+            result.append(value)
+            value += step
+    return result
+
+
+def sample_vectors(rule):
+    """Return the samples of a `PluralRule` as a list of ``(number, tag)``
+    test vectors, the number a `decimal.Decimal`:
+    >>> sample_vectors(PluralRule({'one': 'n is 1 @integer 1',
+    ...                            'other': '@integer 2~3'}))
+    [(Decimal('1'), 'one'), (Decimal('2'), 'other'), (Decimal('3'), 'other')]
+    """
+    result = []
+    for tag in _plural_tags:
+        for kind in ('integer', 'decimal'):
+            ranges = rule.samples.get(tag, {}).get(kind, ())
+            result.extend((value, tag) for value in expand_samples(ranges))
+    return result
+
+
 def test_next_token(tokens, type_, value=None):
     return tokens and tokens[-1][0] == type_ and \
            (value is None or tokens[-1][1] == value)
@@ -170,12 +567,13 @@ class _Parser(object):
       the plural rule elements).
     - The in and within relations can take comma-separated lists, such as:
       'n in 3,5,7..15'.
-    - Samples are ignored.
+    - Samples are not part of the tree, see `parse_samples`.
     The translator parses the expression on instanciation into an attribute
-    called `ast`.
+    called `ast`, and its samples into an attribute called `samples`.
     """
 
     def __init__(self, string):
+        self.samples = parse_samples(string)
         self.tokens = tokenize_rule(string)
         if not self.tokens:
             # If the pattern is only samples, it's entirely possible
@@ -304,6 +702,152 @@ class _Compiler(object):
         raise NotImplementedError()
 
 
+def _operand(expr):
+    """Return the name of the operand an ``expr`` node is based on."""
+    if expr[0] == 'mod':
+        return expr[1][0][0]
+    return expr[0]
+
+
+class _PythonCompiler(_Compiler):
+    """Compiles an expression to Python, on the local variables set by
+    `extract_operands`."""
+
+    compile_and = _binary_compiler('(%s and %s)')
+    compile_or = _binary_compiler('(%s or %s)')
+    compile_not = _unary_compiler('(not %s)')
+
+    def compile_relation(self, method, expr, range_list):
+        expr_code = self.compile(expr)
+        values = []
+        ranges = []
+        for start, end in range_list[1]:
+            if start == end:
+                values.append(self.compile(start))
+            else:
+                ranges.append('%s <= %s <= %s' % (
+                    self.compile(start), expr_code, self.compile(end)))
+        if len(values) == 1:
+            ranges.insert(0, '%s == %s' % (expr_code, values[0]))
+        elif values:
+            ranges.insert(0, '%s in (%s)' % (expr_code, ', '.join(values)))
+        code = ' or '.join(ranges)
+        # `n` (and so `n mod x`) can have a fraction, which is never in a
+        # range but may be within one.
+        if method == 'in' and _operand(expr) == 'n':
+            return '(n == i and (%s))' % code
+        return '(%s)' % code
+
+
+class _Interpreter(object):
+    """Evaluates an expression on the operands of one number, as returned by
+    `extract_operands`."""
+
+    def __init__(self, operands):
+        self.operands = dict(zip(_VARS, operands))
+
+    def evaluate(self, arg):
+        op, args = arg
+        if op in self.operands:
+            return self.operands[op]
+        return getattr(self, 'evaluate_' + op)(*args)
+
+    def evaluate_value(self, value):
+        return value
+
+    def evaluate_and(self, left, right):
+        return self.evaluate(left) and self.evaluate(right)
+
+    def evaluate_or(self, left, right):
+        return self.evaluate(left) or self.evaluate(right)
+
+    def evaluate_not(self, arg):
+        return not self.evaluate(arg)
+
+    def evaluate_mod(self, expr, value):
+        return self.evaluate(expr) % self.evaluate(value)
+
+    def evaluate_is(self, expr, value):
+        return self.evaluate(expr) == self.evaluate(value)
+
+    def evaluate_isnot(self, expr, value):
+        return self.evaluate(expr) != self.evaluate(value)
+
+    def evaluate_relation(self, method, expr, range_list):
+        value = self.evaluate(expr)
+        # `in` only holds integers, `within` any number between the bounds
+        if method == 'in' and value != int(value):
+            return False
+        return any(self.evaluate(start) <= value <= self.evaluate(end)
+                   for start, end in range_list[1])
+
+
+class _NumPyCompiler(_Compiler):
+    """Compiles an expression to Python on NumPy arrays of the operands set
+    by `extract_operands_array`, which evaluates to a boolean array."""
+
+    compile_and = _binary_compiler('(%s & %s)')
+    compile_or = _binary_compiler('(%s | %s)')
+    compile_not = _unary_compiler('(~%s)')
+
+    def compile_relation(self, method, expr, range_list):
+        expr_code = self.compile(expr)
+        ranges = []
+        for start, end in range_list[1]:
+            if start == end:
+                ranges.append('(%s == %s)' % (expr_code, self.compile(start)))
+            else:
+                ranges.append('((%s >= %s) & (%s <= %s))' % (
+                    expr_code, self.compile(start), expr_code, self.compile(end)))
+        code = ' | '.join(ranges)
+        if method == 'in' and _operand(expr) == 'n':
+            return '((n == i) & (%s))' % code
+        return '(%s)' % code
+
+
+class _RustCompiler(_Compiler):
+    """Compiles an expression to Rust, on a ``PluralOperands`` value ``o``.
+    ``o.n`` is a float, all other operands are unsigned integers.
+    """
+
+    compile_n = lambda x: 'o.n'
+    compile_i = lambda x: 'o.i'
+    compile_v = lambda x: 'o.v'
+    compile_w = lambda x: 'o.w'
+    compile_f = lambda x: 'o.f'
+    compile_t = lambda x: 'o.t'
+
+    def literal(self, expr, value):
+        """Compile the `value` node, compared with or applied to `expr`."""
+        if _operand(expr) == 'n':
+            return '%d.0' % value[1][0]
+        return '%d' % value[1][0]
+
+    def compile_mod(self, expr, value):
+        return '(%s %% %s)' % (self.compile(expr), self.literal(expr, value))
+
+    def compile_is(self, expr, value):
+        return '(%s == %s)' % (self.compile(expr), self.literal(expr, value))
+
+    def compile_isnot(self, expr, value):
+        return '(%s != %s)' % (self.compile(expr), self.literal(expr, value))
+
+    def compile_relation(self, method, expr, range_list):
+        expr_code = self.compile(expr)
+        ranges = []
+        for start, end in range_list[1]:
+            if start == end:
+                ranges.append('%s == %s' % (expr_code, self.literal(expr, start)))
+            else:
+                ranges.append('(%s <= %s && %s <= %s)' % (
+                    self.literal(expr, start), expr_code,
+                    expr_code, self.literal(expr, end)))
+        code = ' || '.join(ranges)
+        if method == 'in' and _operand(expr) == 'n':
+            return '(o.n == o.i as f64 && (%s))' % code
+        return '(%s)' % code
+
+
 class _UnicodeCompiler(_Compiler):
     """Returns a unicode pluralization rule again."""
 
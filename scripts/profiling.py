@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+    profiling
+    ~~~~~~~~~~~~~~~~
+    Timing and allocation instrumentation of the import pipeline.
+
+    While a `Profiler` is active, every `stage` records its wall time, CPU
+    time and the memory it allocated (the net change of the memory traced
+    by `tracemalloc`, where available), per stage name and locale.  Stages
+    nest; the figures of a stage exclude those of the stages nested in it,
+    so that they add up to the whole run:
+
+    >>> profiler = start()
+    >>> with stage('parse_global'):
+    ...     with stage('parse_territories'):
+    ...         pass
+    >>> report = stop().report()
+    >>> sorted(report['stages'])
+    ['parse_global', 'parse_territories']
+    >>> report['stages']['parse_global']['count']
+    1
+
+    When no profiler is active, `stage` does nothing.
+"""
+import json
+import time
+import timeit
+from contextlib import contextmanager
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    _cpu_time = time.process_time
+except AttributeError:
+    _cpu_time = time.clock
+
+#: The active profiler, if any
+_active = None
+
+
+class Profiler(object):
+    """Accumulates the figures of the stages of an import, by ``(stage,
+    locale)``.
+
+    :param trace_memory: whether to trace allocations with `tracemalloc`
+    """
+
+    def __init__(self, trace_memory=True):
+        self.records = {}
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self._stack = []
+        self._peak = 0
+
+    def _memory(self):
+        if not self.trace_memory:
+            return 0
+        current, peak = tracemalloc.get_traced_memory()
+        self._peak = max(self._peak, peak)
+        return current
+
+    @contextmanager
+    def stage(self, name, locale=None):
+        """Record the figures of the enclosed code as stage `name`."""
+        # every frame holds the start figures and the totals of the children
+        frame = [timeit.default_timer(), _cpu_time(), self._memory(), 0.0, 0.0, 0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            wall = timeit.default_timer() - frame[0]
+            cpu = _cpu_time() - frame[1]
+            memory = self._memory() - frame[2]
+            if self._stack:
+                parent = self._stack[-1]
+                parent[3] += wall
+                parent[4] += cpu
+                parent[5] += memory
+            self.add(name, locale, 1, wall - frame[3], cpu - frame[4], memory - frame[5])
+
+    def add(self, name, locale, count, wall, cpu, memory):
+        """Add figures to the record of stage `name` of `locale`."""
+        record = self.records.get((name, locale))
+        if record is None:
+            record = self.records[(name, locale)] = [0, 0.0, 0.0, 0]
+        record[0] += count
+        record[1] += wall
+        record[2] += cpu
+        record[3] += memory
+
+    def drain(self):
+        """Return the records as a list and forget them, e.g. to send them
+        from a worker process to the profiler of the main process."""
+        records = [key + tuple(value) for key, value in self.records.items()]
+        self.records = {}
+        return records
+
+    def merge(self, records):
+        """Add the records returned by `drain` of another profiler."""
+        for name, locale, count, wall, cpu, memory in records:
+            self.add(name, locale, count, wall, cpu, memory)
+
+    def report(self):
+        """Return the figures as a JSON serializable dict: the totals of the
+        run (``total``, with the peak traced memory of this process), by
+        stage (``stages``) and by locale (``locales``, with the figures of
+        each of its stages)."""
+        def figures():
+            return {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'memory': 0}
+
+        def add(target, count, wall, cpu, memory):
+            target['count'] += count
+            target['wall'] += wall
+            target['cpu'] += cpu
+            target['memory'] += memory
+
+        total = figures()
+        stages = {}
+        locales = {}
+        for (name, locale), values in sorted(self.records.items(),
+                                             key=lambda item: (item[0][0], item[0][1] or '')):
+            add(total, *values)
+            add(stages.setdefault(name, figures()), *values)
+            if locale is not None:
+                entry = locales.setdefault(locale, figures())
+                entry.setdefault('stages', {})[name] = figures()
+                add(entry, *values)
+                add(entry['stages'][name], *values)
+        total['peak_memory'] = self._peak
+        return {'total': total, 'stages': stages, 'locales': locales}
+
+
+def start(trace_memory=True):
+    """Create and activate a profiler, and return it."""
+    global _active
+    _active = Profiler(trace_memory)
+    if _active.trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _active
+
+
+def stop():
+    """Deactivate the active profiler, and return it."""
+    global _active
+    profiler, _active = _active, None
+    if profiler is not None and profiler.trace_memory:
+        profiler._memory()
+        tracemalloc.stop()
+    return profiler
+
+
+def active():
+    """Return the active profiler, or ``None``."""
+    return _active
+
+
+@contextmanager
+def stage(name, locale=None):
+    """Record the enclosed code as stage `name` of `locale` in the active
+    profiler, if any."""
+    if _active is None:
+        yield
+    else:
+        with _active.stage(name, locale):
+            yield
+
+
+def format_report(report, top=10):
+    """Return a human readable summary of a `Profiler.report`: the totals,
+    and the `top` slowest stages and locales by wall time."""
+    def row(label, entry):
+        return '  %-32s %6d %9.3fs %9.3fs %10.1f KiB' % (
+            label, entry['count'], entry['wall'], entry['cpu'], entry['memory'] / 1024.0)
+
+    header = '  %-32s %6s %10s %10s %14s' % ('', 'count', 'wall', 'cpu', 'allocated')
+    total = report['total']
+    lines = ['Profile: %.3fs wall, %.3fs CPU, %.1f KiB peak traced memory' % (
+        total['wall'], total['cpu'], total['peak_memory'] / 1024.0)]
+    for title, entries in (('stages', report['stages']), ('locales', report['locales'])):
+        if not entries:
+            continue
+        lines.append('Slowest %s:' % title)
+        lines.append(header)
+        slowest = sorted(entries.items(), key=lambda item: -item[1]['wall'])[:top]
+        lines.extend(row(name, entry) for name, entry in slowest)
+    return '\n'.join(lines)
+
+
+def write_report(path, report):
+    """Write a `Profiler.report` to `path` as JSON."""
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+    territories
+    ~~~~~~~~~~~~~~~~
+    Territory containment as a transitive closure, stored as one bitset per
+    territory over all region codes, and the territory data resolved with
+    it.
+
+    The CLDR ``territoryContainment`` groups only list their direct members;
+    a territory is also contained in every group that contains one of its
+    containers:
+
+    >>> index = containment_index({'001': ['150'], '150': ['155'], '155': ['DE']})
+    >>> index['regions']
+    ['001', '150', '155', 'DE']
+    >>> index['containers']['DE']
+    [7]
+    >>> containment = Containment(index)
+    >>> containment.containers('DE')
+    ['001', '150', '155']
+    >>> containment.contains('001', 'DE')
+    True
+"""
+
+#: Number of bits of the words a bitset is stored as
+WORD_BITS = 64
+
+#: The fields of the resolved week data of a territory, in order
+WEEK_DATA_FIELDS = ('min_days', 'first_day', 'weekend_start', 'weekend_end')
+
+
+def containment_closure(groups):
+    """Return the set of all groups containing each territory, directly or
+    through other groups.
+
+    :param groups: the direct members of every group, by group code
+    """
+    parents = {}
+    for group, members in groups.items():
+        for member in members:
+            parents.setdefault(member, set()).add(group)
+
+    closure = {}
+    for territory in parents:
+        result = set()
+        stack = list(parents[territory])
+        while stack:
+            group = stack.pop()
+            if group not in result:
+                result.add(group)
+                stack.extend(parents.get(group, ()))
+        closure[territory] = result
+    return closure
+
+
+def containment_index(groups):
+    """Return the containment closure of `groups` as stored in the global
+    data: a dict of the sorted list of all region codes (``regions``) and,
+    for every contained territory, the bitset of its containers
+    (``containers``).  Bit ``k`` of a bitset stands for ``regions[k]``; the
+    bitset is a list of `WORD_BITS` bit words, least significant first.
+    """
+    closure = containment_closure(groups)
+    regions = set(groups)
+    for members in groups.values():
+        regions.update(members)
+    regions = sorted(regions)
+    bits = dict((code, 1 << idx) for idx, code in enumerate(regions))
+    size = (len(regions) + WORD_BITS - 1) // WORD_BITS
+    containers = {}
+    for territory, containing in closure.items():
+        mask = 0
+        for group in containing:
+            mask |= bits[group]
+        containers[territory] = _to_words(mask, size)
+    return {'regions': regions, 'containers': containers}
+
+
+class Containment(object):
+    """Answers containment queries on a `containment_index` in constant time
+    per query (for bitsets that fit machine words).
+
+    :param index: the ``territory_containment`` entry of the global data
+    """
+
+    def __init__(self, index):
+        self.regions = list(index['regions'])
+        self._bits = dict((code, 1 << idx) for idx, code in enumerate(self.regions))
+        self._containers = dict((territory, _from_words(words))
+                                for territory, words in index['containers'].items())
+
+    def mask(self, codes):
+        """Return the bitset of a list of region codes; unknown codes have
+        no bit."""
+        mask = 0
+        for code in codes:
+            mask |= self._bits.get(code, 0)
+        return mask
+
+    def containers(self, territory):
+        """Return the sorted codes of all regions containing `territory`."""
+        mask = self._containers.get(territory, 0)
+        return [code for code in self.regions if mask & self._bits[code]]
+
+    def contains(self, region, territory):
+        """Return whether `region` contains `territory`, directly or not."""
+        return bool(self._containers.get(territory, 0) & self._bits.get(region, 0))
+
+    def within(self, territory, mask):
+        """Return whether `territory` is, or is contained in, one of the
+        regions of the bitset `mask` (see `mask`)."""
+        return bool((self._containers.get(territory, 0) | self._bits.get(territory, 0)) & mask)
+
+
+def resolve_week_data(entries, containment):
+    """Resolve the week data of every territory: for each field, the value
+    of the last entry that lists the territory or a region containing it.
+    Returns a list of the values of `WEEK_DATA_FIELDS` by territory, with
+    ``None`` for fields no entry applies to:
+
+    >>> containment = Containment(containment_index({'001': ['US', 'DE']}))
+    >>> week_data = resolve_week_data([('first_day', ['001'], 0),
+    ...                                ('first_day', ['US'], 6)], containment)
+    >>> week_data['DE'], week_data['US']
+    ([None, 0, None, None], [None, 6, None, None])
+
+    :param entries: ``(field, territories, value)`` tuples in CLDR order
+    :param containment: the `Containment` of the territories
+    """
+    entries = [(WEEK_DATA_FIELDS.index(field), set(territories),
+                containment.mask(territories), value)
+               for field, territories, value in entries]
+    territories = set(containment.regions)
+    for _, listed, _, _ in entries:
+        territories |= listed
+    result = {}
+    for territory in sorted(territories):
+        values = [None] * len(WEEK_DATA_FIELDS)
+        for field, listed, mask, value in entries:
+            if territory in listed or containment.within(territory, mask):
+                values[field] = value
+        result[territory] = values
+    return result
+
+
+def _to_words(mask, size):
+    return [(mask >> (idx * WORD_BITS)) & ((1 << WORD_BITS) - 1) for idx in range(size)]
+
+
+def _from_words(words):
+    mask = 0
+    for idx, word in enumerate(words):
+        mask |= word << (idx * WORD_BITS)
+    return mask
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+    zones
+    ~~~~~~~~~~~~~~~~
+    Time zone index of the global data: every time zone id, alias or not,
+    mapped to its canonical id, its territory and the metazones it used over
+    time, so that the names of a zone are found with one lookup in the index
+    and one in the locale data.
+
+    The ``from`` and ``to`` bounds of the CLDR ``usesMetazone`` elements are
+    kept as seconds since the epoch (UTC); a missing bound is ``None``:
+
+    >>> index = zone_index({'Europe/London': 'GB'}, {'GB': 'Europe/London'},
+    ...                    {'Europe/London': [(None, '1971-10-31 02:00', 'Europe_Central'),
+    ...                                       ('1971-10-31 02:00', None, 'GMT')]})
+    >>> zones = ZoneIndex(index)
+    >>> zones.canonical('GB')
+    'Europe/London'
+    >>> zones.meta_zone('GB')
+    'GMT'
+    >>> zones.meta_zone('Europe/London', 0)
+    'Europe_Central'
+"""
+import calendar
+import time
+
+#: Format of the ``from`` and ``to`` attributes of ``usesMetazone``
+META_ZONE_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def parse_meta_zone_time(s):
+    """Return a ``usesMetazone`` bound as seconds since the epoch, or ``None``
+    for a missing bound.
+
+    >>> parse_meta_zone_time('1971-10-31 02:00')
+    57722400
+    """
+    if not s:
+        return None
+    return calendar.timegm(time.strptime(s, META_ZONE_TIME_FORMAT))
+
+
+def zone_index(zone_territories, zone_aliases, meta_zones, windows_zones=None):
+    """Return the zone index as stored in the global data: a dict of the
+    records of all zone ids and aliases (``zones``) and the zones of every
+    Windows zone by territory (``windows``).  A zone record is a list of the
+    canonical id, the territory and the ``[from, to, metazone]`` periods of
+    the zone, sorted by time.
+
+    :param zone_territories: the territory of every canonical zone id
+    :param zone_aliases: the canonical zone id of every alias
+    :param meta_zones: the ``(from, to, metazone)`` periods of every
+                       canonical zone id, with the bounds as in CLDR
+    :param windows_zones: the zone ids of every Windows zone, by territory
+    """
+    zones = {}
+    for tzid in sorted(set(zone_territories) | set(meta_zones)):
+        periods = [[parse_meta_zone_time(start), parse_meta_zone_time(end), mzone]
+                   for start, end, mzone in meta_zones.get(tzid, ())]
+        periods.sort(key=lambda period: (period[0] is not None, period[0]))
+        zones[tzid] = [tzid, zone_territories.get(tzid, '001'), periods]
+    for alias, tzid in zone_aliases.items():
+        if tzid in zones and alias not in zones:
+            zones[alias] = zones[tzid]
+    windows = {}
+    for name, territories in (windows_zones or {}).items():
+        windows[name] = dict((territory, [zones[tzid][0] if tzid in zones else tzid
+                                          for tzid in tzids])
+                             for territory, tzids in territories.items())
+    return {'zones': zones, 'windows': windows}
+
+
+class ZoneIndex(object):
+    """Answers time zone queries on a `zone_index`.
+
+    :param index: the ``zone_index`` entry of the global data
+    """
+
+    def __init__(self, index):
+        self._zones = index['zones']
+        self._windows = index['windows']
+
+    def canonical(self, tzid):
+        """Return the canonical id of the zone `tzid`, or ``None`` for an
+        unknown zone."""
+        record = self._zones.get(tzid)
+        return record[0] if record else None
+
+    def territory(self, tzid):
+        """Return the territory of the zone `tzid`, or ``None`` for an unknown
+        zone."""
+        record = self._zones.get(tzid)
+        return record[1] if record else None
+
+    def meta_zone(self, tzid, timestamp=None):
+        """Return the metazone the zone `tzid` uses at `timestamp`, or
+        ``None`` if it uses none then.
+
+        :param tzid: a zone id or alias
+        :param timestamp: seconds since the epoch (UTC), or ``None`` for the
+                          metazone the zone uses today
+        """
+        record = self._zones.get(tzid)
+        if not record:
+            return None
+        for start, end, mzone in record[2]:
+            if timestamp is None:
+                if end is None:
+                    return mzone
+            elif (start is None or start <= timestamp) and (end is None or timestamp < end):
+                return mzone
+        return None
+
+    def windows_zone(self, name, territory='001'):
+        """Return the canonical id of the zone of the Windows zone `name` in
+        `territory`, falling back to its zone for the world (``001``)."""
+        territories = self._windows.get(name, {})
+        tzids = territories.get(territory) or territories.get('001')
+        return tzids[0] if tzids else None
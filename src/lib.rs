@@ -1,5 +1,7 @@
 #![allow(dead_code)]
 
+pub mod plural;
+
 pub mod globalize {
 
 }
@@ -0,0 +1,82 @@
+//! CLDR plural rules, compiled to plain Rust functions by the importer.
+
+/// The plural category of a number.
+#[derive(Clone, Copy, Debug, PartialEq, Eq, Hash)]
+pub enum PluralCategory {
+    Zero,
+    One,
+    Two,
+    Few,
+    Many,
+    Other,
+}
+
+/// The operands of a number the plural rules are evaluated on, see
+/// http://unicode.org/reports/tr35/tr35-numbers.html#Operands
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub struct PluralOperands {
+    /// absolute value of the number
+    pub n: f64,
+    /// integer digits
+    pub i: u64,
+    /// number of visible fraction digits, with trailing zeros
+    pub v: u64,
+    /// number of visible fraction digits, without trailing zeros
+    pub w: u64,
+    /// visible fraction digits, with trailing zeros
+    pub f: u64,
+    /// visible fraction digits, without trailing zeros
+    pub t: u64,
+}
+
+impl PluralOperands {
+    /// Extract the operands of a number in its decimal string form, such
+    /// as `"1.50"`; trailing fraction zeros are significant.
+    pub fn from_decimal_str(s: &str) -> Option<PluralOperands> {
+        let s = if s.starts_with('-') { &s[1..] } else { s };
+        let (int_part, frac_part) = match s.find('.') {
+            Some(pos) => (&s[..pos], &s[pos + 1..]),
+            None => (s, ""),
+        };
+        let trimmed = frac_part.trim_end_matches('0');
+        Some(PluralOperands {
+            n: s.parse().ok()?,
+            i: int_part.parse().ok()?,
+            v: frac_part.len() as u64,
+            w: trimmed.len() as u64,
+            f: if frac_part.is_empty() { 0 } else { frac_part.parse().ok()? },
+            t: if trimmed.is_empty() { 0 } else { trimmed.parse().ok()? },
+        })
+    }
+}
+
+impl From<u64> for PluralOperands {
+    fn from(n: u64) -> PluralOperands {
+        PluralOperands { n: n as f64, i: n, v: 0, w: 0, f: 0, t: 0 }
+    }
+}
+
+include!(concat!(env!("CARGO_MANIFEST_DIR"), "/cldr/plurals.rs"));
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn cardinal_samples() {
+        for &(class, value, expected) in CARDINAL_SAMPLES.iter() {
+            let operands = PluralOperands::from_decimal_str(value).unwrap();
+            assert_eq!(CARDINAL_RULES[class](&operands), expected,
+                       "cardinal rule {} on {}", class, value);
+        }
+    }
+
+    #[test]
+    fn ordinal_samples() {
+        for &(class, value, expected) in ORDINAL_SAMPLES.iter() {
+            let operands = PluralOperands::from_decimal_str(value).unwrap();
+            assert_eq!(ORDINAL_RULES[class](&operands), expected,
+                       "ordinal rule {} on {}", class, value);
+        }
+    }
+}